@@ -0,0 +1,63 @@
+"""State derived from the games, kept current by every --append ingest.
+
+DedupIndex.append and PartitionStore.append merge the new games into their
+store under its lock, and hand the same games to an AppendHook: the saved
+streaks and dashboard snapshots are loaded before the merge rewrites the
+store, so afterwards the new games are all they need. The streaks are
+rebuilt if one of the new games is older than its player's last game.
+
+The merged games are also run through validate.validate(), and a summary of
+any issues is printed to stderr. Validating the new games rather than all of
+history keeps this cheap; validate.py checks everything. It is skipped if
+NumPy isn't installed.
+"""
+import sys
+from operator import itemgetter
+
+from build_snapshots import SnapshotBuilder
+from records import GameBatch
+from streaks import StreakEngine
+
+
+class AppendHook:
+    """Derived state of one store, brought up to date around a merge"""
+
+    def __init__(self, source):
+        # A data.csv path or a PartitionStore; the caller holds its lock
+        self.source = source
+        self.streaks = StreakEngine.load(source)
+        self.snapshots = SnapshotBuilder.load(source)
+        # (issues, proposals) for the merged games, once validated
+        self.validation = None
+
+    def merged(self, games):
+        """Fold in the games that were just merged into the store"""
+        streaks = self.streaks
+        # Sources can list one player's days out of order; a stable sort
+        # keeps them from looking like late games
+        streaks.add_games(sorted(games, key=itemgetter(1)))
+        if streaks.stale:
+            streaks.rebuild(self.source)
+        else:
+            # List players in data.csv order, as a full read would
+            streaks.players = dict(sorted(streaks.players.items()))
+        streaks.save(self.source)
+        self.snapshots.add_games(games)
+        self.snapshots.sort()
+        self.snapshots.save(streaks)
+        if games:
+            self.validation = validate_games(games)
+
+
+def validate_games(games, file=None):
+    """Validate games and print a summary of any issues; returns (issues, proposals), or None without NumPy"""
+    try:
+        import validate
+    except ImportError:
+        return None
+    issues, proposals = validate.validate(GameBatch.from_games(games))
+    if issues or proposals:
+        counts = ', '.join(f"{name}: {count}" for name, count in validate.count_issues(issues).items())
+        print(f"Validation: {len(issues)} issues in {len(games)} new games ({counts or 'none'}), "
+              f"{len(proposals)} proposed splits; run validate.py for details", file=file or sys.stderr)
+    return issues, proposals
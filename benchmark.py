@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""Benchmark the ingest pipeline on synthetic data of increasing size.
+
+For each size the harness generates (or reuses) a deterministic iMessage
+export, digest and data.csv with synthetic.py, then times each case in a
+fresh subprocess so its peak RSS is measured on its own:
+
+  parse_imessage  export lines through the chat export parser
+  parse_entries   digest lines through the digest parser
+  dedup_build     building the dedup index from data.csv
+  dedup_open      reopening an up-to-date dedup index
+  append          merging new games into data.csv with --append
+
+Results are written as JSON. Pass a previous results file with --baseline to
+print the speedup of every case and fail if any regressed past --tolerance.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic import Generator, emoji_for, write_lines
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+CASES = ('parse_imessage', 'parse_entries', 'dedup_build', 'dedup_open', 'append')
+APPEND_GAMES = 1000
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KiB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux KiB
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def case_inputs(workdir, size, seed):
+    """Paths of the generated inputs for size, creating any that are missing"""
+    paths = {
+        'export': os.path.join(workdir, f"export-{size}-{seed}.txt"),
+        'digest': os.path.join(workdir, f"digest-{size}-{seed}.txt"),
+        'csv': os.path.join(workdir, f"data-{size}-{seed}", 'data.csv'),
+    }
+    if not os.path.exists(paths['export']):
+        write_lines(paths['export'], Generator(seed).iter_export_lines(size))
+    if not os.path.exists(paths['digest']):
+        write_lines(paths['digest'], Generator(seed).iter_digest_lines(size))
+    if not os.path.exists(paths['csv']):
+        os.makedirs(os.path.dirname(paths['csv']), exist_ok=True)
+        write_lines(paths['csv'], Generator(seed).iter_csv_lines(size))
+    return paths
+
+
+def run_case(name, paths, seed):
+    """Run one case in this process; returns (seconds, lines/rows/games processed)"""
+    if name == 'parse_imessage':
+        from parse_imessage import iter_games
+        with open(paths['export'], 'r', encoding='utf-8') as f:
+            lines = sum(1 for _ in f)
+            f.seek(0)
+            start = time.perf_counter()
+            for _ in iter_games(f):
+                pass
+        return time.perf_counter() - start, lines
+
+    if name == 'parse_entries':
+        from parse_entries import iter_entries
+        with open(paths['digest'], 'r', encoding='utf-8') as f:
+            lines = sum(1 for _ in f)
+            f.seek(0)
+            start = time.perf_counter()
+            for _ in iter_entries(f):
+                pass
+        return time.perf_counter() - start, lines
+
+    from build_snapshots import build as build_snapshots, snapshot_dir
+    from dedup_index import DedupIndex
+    from datafile import state_path
+    from partitions import sort_partition
+    from streaks import StreakEngine
+
+    data = paths['csv']
+    index_file = state_path(data, 'dedup.sqlite')
+    if name == 'dedup_build':
+        if os.path.exists(index_file):
+            os.remove(index_file)
+        start = time.perf_counter()
+        with DedupIndex(data) as index:
+            games = len(index)
+        return time.perf_counter() - start, games
+
+    if name == 'dedup_open':
+        with DedupIndex(data):
+            pass
+        start = time.perf_counter()
+        with DedupIndex(data) as index:
+            games = len(index)
+        return time.perf_counter() - start, games
+
+    if name == 'append':
+        # New games from another seed, rendered up front so only the append is
+        # timed. They're dated day by day after the last date in the data (the
+        # generator's own dates wrap around the season), as in a real ingest;
+        # older games would time the streaks' full rebuild instead
+        with open(data, 'r', encoding='utf-8') as f:
+            next(f)
+            last = datetime.date.fromisoformat(max(line.split(',', 2)[1] for line in f))
+        generated = Generator(seed + 1).iter_games()
+        games = []
+        day = 0
+        previous = None
+        for user, date, scores, total in generated:
+            if date != previous:
+                day += 1
+                previous = date
+            date = last + datetime.timedelta(days=day)
+            games.append((user, date.isoformat(), [(str(s), emoji_for(s)) for s in scores], str(total)))
+            if len(games) == APPEND_GAMES:
+                break
+        # Generated data is in date order; sort it first (untimed, and kept for
+        # later runs) so the timed append is the streaming merge rather than
+        # the one-off load-and-sort fallback for an unsorted file
+        sort_partition(data)
+        backup = f"{data}.orig"
+        shutil.copyfile(data, backup)
+        with DedupIndex(data):
+            pass
+        streaks_file = state_path(data, 'streaks.json')
+        StreakEngine.load(data).save(data)
+        build_snapshots(data)
+        # The append validates the new games; load NumPy beforehand, like
+        # the other state above
+        import validate  # noqa: F401
+        try:
+            start = time.perf_counter()
+            with DedupIndex(data) as index:
+                index.append(games)
+            return time.perf_counter() - start, len(games)
+        finally:
+            os.replace(backup, data)
+            os.remove(index_file)
+            os.remove(streaks_file)
+            os.remove(state_path(data, 'snapshots.json'))
+            shutil.rmtree(snapshot_dir(data))
+
+    raise ValueError(f"unknown case {name}")
+
+
+def measure(name, paths, size, seed, repeat):
+    """Best-of-repeat timing of one case, each run in a fresh interpreter"""
+    runs = []
+    for _ in range(repeat):
+        cmd = [sys.executable, os.path.abspath(__file__), '--run-case', name, '--seed', str(seed),
+               '--inputs', json.dumps(paths)]
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        runs.append(json.loads(result.stdout))
+    best = min(runs, key=lambda run: run['seconds'])
+    return {
+        'case': name,
+        'size': size,
+        'seconds': round(best['seconds'], 6),
+        'items': best['items'],
+        'items_per_second': round(best['items'] / best['seconds']) if best['seconds'] else None,
+        'peak_rss_kb': max(run['peak_rss_kb'] for run in runs),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print speedups against a baseline; returns the cases slower than tolerance allows"""
+    previous = {(r['case'], r['size']): r for r in baseline['results']}
+    regressions = []
+    for result in results:
+        before = previous.get((result['case'], result['size']))
+        if before is None or not result['seconds']:
+            continue
+        speedup = before['seconds'] / result['seconds']
+        memory = result['peak_rss_kb'] / before['peak_rss_kb'] if before['peak_rss_kb'] else 1
+        print(f"{result['case']:>15} {result['size']:>10}  {speedup:6.2f}x speed  {memory:6.2f}x memory")
+        if speedup < 1 - tolerance:
+            regressions.append(result)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark MapTap ingestion on synthetic data')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='comma-separated data sizes (export/digest lines, data.csv rows)')
+    parser.add_argument('--cases', default=','.join(CASES), help='comma-separated cases to run')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case; the fastest is kept')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workdir', help='keep generated data here and reuse it across runs')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', help='previous results file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='allowed slowdown against the baseline before failing')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    parser.add_argument('--inputs', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.run_case:
+        seconds, items = run_case(args.run_case, json.loads(args.inputs), args.seed)
+        print(json.dumps({'seconds': seconds, 'items': items, 'peak_rss_kb': peak_rss_kb()}))
+        return
+
+    sizes = [int(size.replace('_', '')) for size in args.sizes.split(',')]
+    cases = args.cases.split(',')
+    for name in cases:
+        if name not in CASES:
+            parser.error(f"unknown case {name}")
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='maptap-bench-')
+    os.makedirs(workdir, exist_ok=True)
+    results = []
+    try:
+        for size in sizes:
+            paths = case_inputs(workdir, size, args.seed)
+            for name in cases:
+                result = measure(name, paths, size, args.seed, args.repeat)
+                results.append(result)
+                print(f"{name:>15} {size:>10}  {result['seconds']:9.4f}s  "
+                      f"{result['items_per_second'] or 0:>10}/s  {result['peak_rss_kb']:>8} KiB")
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'meta': {
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpus': os.cpu_count(),
+                'seed': args.seed,
+                'repeat': args.repeat,
+            },
+            'results': results,
+        }, f, indent=2)
+        f.write('\n')
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} case(s) slower than the baseline allows", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""Materialize the dashboard's aggregate responses as static JSON snapshots.
+
+Ingesting with --append runs this, and it can also be run by hand. Only
+games appended to data.csv since the previous build are folded into the
+persisted aggregates, and the streaks come from streaks.StreakEngine. The
+JSON files mirror the responses of server.js's /api/leaderboard,
+/api/aggregations and the streaks in /api/analytics. Files are only rewritten when their content changes, and
+manifest.json lists a content hash per file for use as a stable ETag.
+"""
+import argparse
+import bisect
+import datetime
+import hashlib
+import json
+import os
+
+from datafile import DATA_CSV, data_source
+from streaks import StreakEngine, js_round, rolling_averages
+
+SNAPSHOT_DIR = os.path.join('public', 'snapshots')
+STATE_VERSION = 2
+PERIODS = ('day', 'week', 'month')
+
+
+def period_key(date, period):
+    """Same period keys as getPeriodKey() in server.js"""
+    if period not in ('week', 'month', 'quarter', 'year'):
+        return date
+    try:
+        d = datetime.date.fromisoformat(date)
+    except ValueError:
+        # server.js gets NaN for every part of a date it can't parse
+        return {'week': 'NaN-WNaN', 'month': 'NaN-NaN', 'quarter': 'NaN-QNaN', 'year': 'NaN'}[period]
+    if period == 'week':
+        return f"{d.year}-W{d.isocalendar()[1]:02d}"
+    if period == 'month':
+        return f"{d.year}-{d.month:02d}"
+    if period == 'quarter':
+        # Same formula as server.js, so March lands in Q2
+        return f"{d.year}-Q{d.month // 3 + 1}"
+    return str(d.year)
+
+
+def snapshot_dir(data_path):
+    """Default output directory: public/snapshots next to the data file (or partition directory)"""
+    return os.path.join(os.path.dirname(os.path.normpath(data_path)), SNAPSHOT_DIR)
+
+
+def empty_state(out_dir):
+    return {
+        'version': STATE_VERSION,
+        'source': None,
+        'out': out_dir,
+        'build': 0,
+        'users': {},
+        'userDates': {},
+        'dateTotals': {},
+        'periods': {period: {} for period in PERIODS},
+    }
+
+
+class SnapshotBuilder:
+    """Persisted aggregates updated one game at a time"""
+
+    def __init__(self, source, state, out_dir):
+        # A DataFile or PartitionStore
+        self.source = source
+        self.state = state
+        self.out_dir = out_dir
+        # Per-date leaderboards touched by this build, loaded on demand
+        self.daily = {}
+        # Games folded in; whether everything is being rebuilt; whether the
+        # saved state already matched the file
+        self.count = 0
+        self.fresh = False
+        self.current = False
+
+    @classmethod
+    def load(cls, data_path=DATA_CSV, out_dir=None, rebuild=False):
+        """Saved aggregates for data_path, with rows appended since the last build folded in.
+
+        out_dir defaults to where the last build wrote, or snapshot_dir().
+        Any other change to the file starts over from the whole file.
+        """
+        source = data_source(data_path)
+        state = read_json(source.state_path('snapshots.json'), None)
+        out_dir = out_dir or (state or {}).get('out') or snapshot_dir(source.data_path)
+        if rebuild or not state or state.get('version') != STATE_VERSION or state['out'] != out_dir:
+            state = empty_state(out_dir)
+        builder = cls(source, state, out_dir)
+        offset = source.changed_since(state['source'])
+        builder.current = offset is None
+        if offset == 0:
+            builder.reset()
+        if offset is not None:
+            builder.add_games(source.iter_games(offset))
+        return builder
+
+    def reset(self):
+        self.state = empty_state(self.out_dir)
+        self.daily = {}
+        self.fresh = True
+        # Per-date files are rebuilt from scratch along with everything else
+        daily_dir = os.path.join(self.out_dir, 'leaderboard')
+        if os.path.isdir(daily_dir):
+            for name in os.listdir(daily_dir):
+                os.remove(os.path.join(daily_dir, name))
+
+    def add_games(self, games):
+        for game in games:
+            self.add_game(game)
+            self.count += 1
+
+    def _daily(self, date):
+        if date not in self.daily:
+            entries = read_json(os.path.join(self.out_dir, 'leaderboard', f"{date}.json"), [])
+            self.daily[date] = {entry['user']: entry for entry in entries}
+        return self.daily[date]
+
+    def add_game(self, game):
+        user, date, scores, total = game
+        user = user.strip().lower()
+        total = int(total)
+        values = [int(score) for score, _ in scores]
+        perfect = values.count(100)
+        lowest = min(values)
+        emojis = [emoji for _, emoji in scores if emoji]
+
+        state = self.state
+        dates = state['userDates'].setdefault(user, [])
+        pos = bisect.bisect_left(dates, date)
+        new_day = pos == len(dates) or dates[pos] != date
+
+        # One leaderboard entry per user and date; later plays that day only
+        # add location stats, as in server.js
+        daily = self._daily(date)
+        if new_day:
+            dates.insert(pos, date)
+            daily[user] = {'user': user, 'totalScore': total, 'gamesPlayed': 1, 'avgScore': total,
+                           'perfectScores': 0, 'lowestScore': lowest, 'emojiCounts': {}}
+        entry = daily[user]
+
+        totals = state['users'].setdefault(user, {
+            'user': user, 'totalScore': 0, 'gamesPlayed': 0, 'avgScore': 0,
+            'perfectScores': 0, 'lowestScore': lowest, 'emojiCounts': {}})
+        for target in (entry, totals):
+            target['perfectScores'] += perfect
+            target['lowestScore'] = min(target['lowestScore'], lowest)
+            for emoji in emojis:
+                target['emojiCounts'][emoji] = target['emojiCounts'].get(emoji, 0) + 1
+
+        if new_day:
+            totals['totalScore'] += total
+            totals['gamesPlayed'] += 1
+            totals['avgScore'] = js_round(totals['totalScore'] / totals['gamesPlayed'])
+            day_total = state['dateTotals'].setdefault(date, [0, 0])
+            day_total[0] += total
+            day_total[1] += 1
+            for period in PERIODS:
+                key = period_key(date, period)
+                bucket = state['periods'][period].setdefault(f"{key}-{user}", {
+                    'period': key, 'user': user, 'totalScore': 0, 'gamesPlayed': 0, 'dates': []})
+                bucket['totalScore'] += total
+                bucket['gamesPlayed'] += 1
+                bucket['dates'].append(date)
+
+    def sort(self):
+        """Order everything as a full read of data.csv would once it's sorted by player and date"""
+        state = self.state
+        state['users'] = dict(sorted(state['users'].items()))
+        for date, entries in self.daily.items():
+            self.daily[date] = dict(sorted(entries.items()))
+        for period, buckets in state['periods'].items():
+            for bucket in buckets.values():
+                bucket['dates'].sort()
+            state['periods'][period] = dict(sorted(buckets.items(), key=lambda item: (item[1]['user'],
+                                                                                      item[1]['period'])))
+
+    def save(self, streaks):
+        """Write the changed snapshots and the state, as describing the source as it is now.
+
+        streaks is the StreakEngine for the same data.
+        """
+        state, out_dir = self.state, self.out_dir
+        manifest = read_json(os.path.join(out_dir, 'manifest.json'), {'files': {}})
+        if self.fresh:
+            manifest['files'] = {}
+        for name, payload in self.snapshots(streaks):
+            manifest['files'][name] = write_if_changed(os.path.join(out_dir, name), payload)
+        state['build'] += 1
+        state['source'] = self.source.state()
+        manifest['files'] = dict(sorted(manifest['files'].items()))
+        manifest['build'] = state['build']
+        write_if_changed(os.path.join(out_dir, 'manifest.json'), manifest)
+        write_if_changed(self.source.state_path('snapshots.json'), state)
+
+    def snapshots(self, streaks):
+        """Yield (relative path, payload) for every snapshot this build changes.
+
+        streaks is the StreakEngine for the same data, which the streaks
+        snapshot comes from.
+        """
+        state = self.state
+        yield 'leaderboard.json', sorted(state['users'].values(), key=lambda u: -u['totalScore'])
+        for date, entries in self.daily.items():
+            yield f"leaderboard/{date}.json", sorted(entries.values(), key=lambda u: -u['totalScore'])
+
+        yield 'streaks.json', streaks.streaks()
+        rolling = rolling_averages(state['dateTotals'])
+        for period in PERIODS:
+            aggregations = sorted(state['periods'][period].values(), key=lambda p: p['period'])
+            yield f"aggregations-{period}.json", {
+                'period': period,
+                'aggregations': aggregations,
+                'rollingAverages': rolling if period == 'day' else {'sevenDay': [], 'thirtyDay': []},
+            }
+
+
+def read_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def write_if_changed(path, payload):
+    """Write payload as JSON unless the file already holds exactly that; return its etag"""
+    data = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    etag = hashlib.sha256(data).hexdigest()[:16]
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return etag
+    except OSError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+    return etag
+
+
+def build(data_path=DATA_CSV, out_dir=None, rebuild=False, streaks=None):
+    """Fold newly appended games into the snapshots; returns the number of games read.
+
+    Pass the StreakEngine if the caller already has it up to date.
+    """
+    if streaks is None:
+        streaks = StreakEngine.load(data_path)
+        if rebuild:
+            streaks.rebuild(data_path)
+        streaks.save(data_path)
+    builder = SnapshotBuilder.load(data_path, out_dir, rebuild)
+    if builder.current:
+        return 0
+    builder.save(streaks)
+    return builder.count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build precomputed dashboard JSON snapshots')
+    parser.add_argument('--data', default=DATA_CSV, help='game data file')
+    parser.add_argument('--out', help='snapshot output directory (default: the previous one, or '
+                        'public/snapshots next to the data file)')
+    parser.add_argument('--rebuild', action='store_true', help='ignore saved state and rebuild everything')
+    args = parser.parse_args(argv)
+
+    count = build(args.data, args.out, args.rebuild)
+    print(f"{count} new games folded into snapshots")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+"""On-disk cache of parsed export chunks, keyed by content hash.
+
+Exports are re-exported in full, often with small edits or messages moved
+around, so byte offsets from an earlier run can't be trusted. Instead an
+input is cut into chunks at message boundaries, where the boundaries are
+chosen by the content of the lines around them (content-defined chunking).
+An edit therefore only changes the chunk it falls in, and the chunks after
+it keep their hashes. The parse result of each chunk is cached under a hash
+of its bytes, the roster and the parser kind (and, for exports, the parser
+state the chunk starts in), so a re-run only parses the chunks that changed
+and costs one hashing pass for the rest.
+
+The cache is a SQLite file with least-recently-used eviction once it grows
+past its size limit.
+"""
+import contextlib
+import hashlib
+import json
+import re
+import sqlite3
+import sys
+import zlib
+
+from datafile import state_path
+
+CACHE_FILE = 'chunks.sqlite'
+CACHE_MB = 64
+# Bump when parser output changes, so old entries stop matching
+CACHE_VERSION = '1'
+# Chunks end at a message boundary once they hold MIN_CHUNK bytes and the
+# hash of the message before it has its low bits clear (about one boundary
+# in 64), or at the first boundary past MAX_CHUNK bytes regardless
+MIN_CHUNK = 16 << 10
+MAX_CHUNK = 1 << 20
+BOUNDARY_MASK = 63
+READ_BYTES = 1 << 20
+# Message ends: a blank line in an export, every line in a digest
+BLANK_LINE = re.compile(rb'\n[ \t\r\f\v]*\n')
+LINE_END = re.compile(rb'\n')
+
+
+def iter_chunks(f, boundary):
+    """Cut a binary file into chunks of whole messages, returned as bytes.
+
+    boundary is a bytes regex matching the end of a message. A run of
+    MAX_CHUNK bytes without any boundary is cut after its last full line, so
+    input without boundaries still splits up.
+    """
+    # Earlier parts of the current chunk, and their size
+    pieces = []
+    size = 0
+    data = b''
+    while True:
+        block = f.read(READ_BYTES)
+        data += block
+        view = memoryview(data)
+        chunk_start = message_start = 0
+        for match in boundary.finditer(data):
+            end = match.end()
+            length = size + end - chunk_start
+            if length >= MAX_CHUNK or (length >= MIN_CHUNK and
+                                       zlib.crc32(view[message_start:end]) & BOUNDARY_MASK == 0):
+                pieces.append(data[chunk_start:end])
+                yield b''.join(pieces)
+                pieces = []
+                size = 0
+                chunk_start = end
+            message_start = end
+        view.release()
+        if not block:
+            break
+        # Keep the unfinished message to search again with the next block
+        pieces.append(data[chunk_start:message_start])
+        size += message_start - chunk_start
+        data = data[message_start:]
+        if len(data) >= MAX_CHUNK:
+            cut = data.rfind(b'\n') + 1
+            if cut:
+                pieces.append(data[:cut])
+                yield b''.join(pieces)
+                pieces = []
+                size = 0
+                data = data[cut:]
+    pieces.append(data[chunk_start:])
+    if size or len(data) > chunk_start:
+        yield b''.join(pieces)
+
+
+def roster_fingerprint(roster):
+    """Hash of everything in a roster that affects parsing"""
+    config = [sorted(roster.players), sorted(roster.exclude), sorted(roster.aliases.items()),
+              sorted(roster.excluded_aliases.items()), roster.exclude_digests]
+    return hashlib.sha256(json.dumps(config).encode('utf-8')).hexdigest()
+
+
+class ChunkCache:
+    """Parse results by chunk hash, in a size-bounded SQLite file"""
+
+    def __init__(self, path, max_bytes=CACHE_MB << 20, salt=''):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.salt = f"{CACHE_VERSION}\0{salt}\0".encode('utf-8')
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS chunks '
+                          '(key TEXT PRIMARY KEY, value BLOB, size INTEGER, used INTEGER) WITHOUT ROWID')
+        # Entries used in this run are stamped with the next tick
+        self.clock = self.conn.execute('SELECT COALESCE(MAX(used), 0) FROM chunks').fetchone()[0] + 1
+        self.hits = self.misses = 0
+        # Keys read this run, to mark as recently used when closing
+        self.used = []
+
+    @classmethod
+    def for_data(cls, data_path, max_mb=CACHE_MB, salt=''):
+        """The cache kept with the sidecar state of data_path"""
+        return cls(state_path(data_path, CACHE_FILE), max_mb << 20, salt)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def key(self, chunk):
+        return hashlib.blake2b(self.salt + chunk, digest_size=20).hexdigest()
+
+    def get(self, key):
+        """Cached value for key, or None"""
+        row = self.conn.execute('SELECT value FROM chunks WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.used.append(key)
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        """Cache a JSON-serializable value; it is committed on close"""
+        data = json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.conn.execute('INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?)', (key, data, len(data), self.clock))
+
+    def close(self):
+        """Commit new entries, record which were used and evict down to the size limit"""
+        with self.conn:
+            self.conn.executemany('UPDATE chunks SET used = ? WHERE key = ?',
+                                  ((self.clock, key) for key in self.used))
+            self._evict()
+        self.conn.close()
+
+    def _evict(self):
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM chunks').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in self.conn.execute('SELECT key, size FROM chunks ORDER BY used'):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        self.conn.executemany('DELETE FROM chunks WHERE key = ?', stale)
+
+
+def open_binary(source):
+    """Open an export file, or stdin for '-', for binary reading"""
+    if source == '-':
+        return contextlib.nullcontext(sys.stdin.buffer)
+    return open(source, 'rb')
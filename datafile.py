@@ -0,0 +1,419 @@
+"""Shared helpers for reading data.csv and its sidecar state"""
+import contextlib
+import fcntl
+import hashlib
+import heapq
+import io
+import itertools
+import mmap
+import os
+import re
+import shutil
+import sys
+from operator import itemgetter
+
+DATA_CSV = 'data.csv'
+HEADER = 'user,date,location_number,location_score,location_emoji,total_score'
+# MapTap weighs the five locations 1, 1, 2, 3, 3 for a 1000 point maximum
+WEIGHTS = (1, 1, 2, 3, 3)
+# Ingest state (dedup index, watermarks, checkpoints) lives next to data.csv
+STATE_DIR = '.maptap'
+# Bytes before the previously seen end of data.csv that must be unchanged
+# for the file to count as only appended to
+FINGERPRINT_BYTES = 4096
+# One data.csv row as (user, date, location, score, total); the emoji in
+# between may itself be a comma, so the total is whatever follows the last one
+ROW_RE = re.compile(rb'^([^,\n]*),([^,\n]*),([^,\n]*),([^,\n]*),[^\n]*,([^,\n]*?)\r*$', re.M)
+# Five rows of one game, locations 1-5, with the same user, date and total;
+# only scores of 0-100 written without leading zeros, so they are their own keys
+GAME_SCORE = rb'(100|[1-9]?[0-9])'
+GAME_RE = re.compile(
+    rb'^([^,\n]*),([^,\n]*),1,' + GAME_SCORE + rb',[^\n]*,([0-9]+)\r?\n'
+    + b''.join(rb'\1,\2,%d,' % loc + GAME_SCORE + rb',[^\n]*,\4\r?\n' for loc in range(2, 6)), re.M)
+
+
+def state_path(data_path, name):
+    """Path of a sidecar state file for the given data file, creating its directory"""
+    directory = os.path.join(os.path.dirname(os.path.abspath(data_path)), STATE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, name)
+
+
+def fingerprint(path, end):
+    """Hash of the FINGERPRINT_BYTES of path that end at offset end"""
+    start = max(0, end - FINGERPRINT_BYTES)
+    with open(path, 'rb') as f:
+        f.seek(start)
+        return hashlib.sha256(f.read(end - start)).hexdigest()
+
+
+def file_state(path):
+    """Size, mtime and tail fingerprint of path, or None if it doesn't exist"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return {
+        'size': stat.st_size,
+        'mtime_ns': stat.st_mtime_ns,
+        'fingerprint': fingerprint(path, stat.st_size),
+    }
+
+
+def changed_since(path, seen):
+    """Compare path with a previously recorded file_state.
+
+    Returns None if the file is unchanged, the byte offset to resume reading
+    from if rows were only appended, or 0 if it has to be read from scratch.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return 0
+    if not seen:
+        return 0
+    size = seen['size']
+    if size == stat.st_size and seen['mtime_ns'] == stat.st_mtime_ns:
+        return None
+    if size <= stat.st_size and fingerprint(path, size) == seen['fingerprint']:
+        return size if size < stat.st_size else None
+    return 0
+
+
+def open_at(path, offset=0):
+    """Open path for text reading starting at a byte offset"""
+    raw = open(path, 'rb')
+    raw.seek(offset)
+    return io.TextIOWrapper(raw, encoding='utf-8', newline='')
+
+
+def split_row(line):
+    """Split a data.csv line into its six fields.
+
+    The emoji field is unquoted and may itself be a comma, so the total is
+    taken from the right and the emoji is whatever sits in between.
+    """
+    parts = line.rstrip('\r\n').split(',', 4)
+    if len(parts) < 5:
+        return None
+    user, date, loc_num, score, rest = parts
+    emoji, sep, total = rest.rpartition(',')
+    if not sep:
+        return None
+    return user.strip(), date.strip(), loc_num, score, emoji, total
+
+
+def iter_csv_games(lines):
+    """Group data.csv lines into (user, date, [(score, emoji), ...], total) games.
+
+    Rows of one game are consecutive with rising location numbers; a new game
+    starts when the user, date or total changes or the location number does
+    not increase. Rows with missing or non-numeric fields are skipped.
+    """
+    game = None
+    last_loc = 0
+    for line in lines:
+        if not line.strip() or line.startswith('user,'):
+            continue
+        fields = split_row(line)
+        if fields is None:
+            continue
+        user, date, loc_num, score, emoji, total = fields
+        try:
+            loc = int(loc_num)
+            int(score)
+            int(total)
+        except ValueError:
+            continue
+        if game is None or loc <= last_loc or (user, date, total) != (game[0], game[1], game[3]):
+            if game is not None:
+                yield game
+            game = (user, date, [], total)
+        game[2].append((score, emoji))
+        last_loc = loc
+    if game is not None:
+        yield game
+
+
+class DataFile:
+    """One data file as a source of games for the derived state.
+
+    The streaks and snapshots only use these methods, so a PartitionStore
+    can stand in for data.csv.
+    """
+
+    def __init__(self, data_path=DATA_CSV):
+        self.data_path = data_path
+
+    def state_path(self, name):
+        return state_path(self.data_path, name)
+
+    def state(self):
+        return file_state(self.data_path)
+
+    def changed_since(self, seen):
+        return changed_since(self.data_path, seen)
+
+    def iter_games(self, offset=0):
+        """Games from byte offset onwards, in file order"""
+        if os.path.exists(self.data_path):
+            with open_at(self.data_path, offset) as f:
+                yield from iter_csv_games(f)
+
+
+def data_source(data):
+    """data as a source of games: a DataFile for a path, else as it is"""
+    return DataFile(data) if isinstance(data, (str, os.PathLike)) else data
+
+
+def key_score(score):
+    """Location score as used in game keys.
+
+    Scores over 100 are an emoji digit merged onto the score ("931" is 93
+    followed by a digit emoji), so they key on the leading digits to match
+    the repaired row.
+    """
+    value = int(score)
+    return value // 10 if value > 100 else value
+
+
+def game_key(game):
+    """Key identifying one game: lowercased user, date, location scores and total"""
+    user, date, scores, total = game
+    score_part = '-'.join(str(key_score(score)) for score, _ in scores)
+    return f"{user.strip().lower()}|{date}|{score_part}|{int(total)}"
+
+
+def game_rows(game):
+    """Yield the five CSV rows for a parsed game"""
+    user, date, scores, final_score = game
+    for loc_num, (score, emoji) in enumerate(scores, 1):
+        yield f"{user},{date},{loc_num},{score},{emoji},{final_score}"
+
+
+def _bytes_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        # int() only takes ASCII digits from bytes
+        return int(value.decode('utf-8'))
+
+
+def _iter_single_rows(buf, start, end):
+    """Yield (user, date, location, score key, total) for the rows of buf[start:end] that parse"""
+    for row in ROW_RE.finditer(buf, start, end):
+        user, date, loc, score, total = row.groups()
+        if user == b'user':
+            continue
+        try:
+            loc = _bytes_int(loc)
+            score = _bytes_int(score)
+            _bytes_int(total)
+        except ValueError:
+            continue
+        yield user, date, loc, str(score // 10 if score > 100 else score), total
+
+
+def _iter_rows(buf, start, end):
+    """Yield (user, date, first location, last location, score keys, total) for buf[start:end].
+
+    A regular five-row game comes out as one item with its scores already
+    joined; any other row comes out on its own.
+    """
+    pos = start
+    for game in GAME_RE.finditer(buf, start, end):
+        if game.start() > pos:
+            for user, date, loc, score, total in _iter_single_rows(buf, pos, game.start()):
+                yield user, date, loc, loc, score, total
+        user, date, total = game.group(1, 2, 4)
+        yield user, date, 1, 5, b'-'.join(game.group(3, 5, 6, 7, 8)).decode(), total
+        pos = game.end()
+    if pos < end:
+        for user, date, loc, score, total in _iter_single_rows(buf, pos, end):
+            yield user, date, loc, loc, score, total
+
+
+def iter_game_keys(path, offset=0):
+    """Yield game_key() of every game in data.csv from byte offset onwards.
+
+    Gives the same keys as game_key() over iter_csv_games(), but scans the
+    memory-mapped file with regexes that match a whole game at a time: rows
+    are never decoded or split, emojis are skipped, and the user and date
+    are decoded once per game.
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= offset:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            raw_user = raw_date = user = date = total = None
+            scores = []
+            last_loc = 0
+            for u, d, first, last, score, t in _iter_rows(buf, offset, size):
+                # Raw bytes equal means the stripped fields are equal too
+                same = u == raw_user and d == raw_date and t == total
+                if not same:
+                    raw_user, raw_date = u, d
+                    u, d = u.decode('utf-8').strip(), d.decode('utf-8').strip()
+                    same = (u, d, t) == (user, date, total)
+                if not same or first <= last_loc:
+                    if scores:
+                        yield f"{user.lower()}|{date}|{'-'.join(scores)}|{_bytes_int(total)}"
+                    if not same:
+                        user, date, total = u, d, t
+                    scores = []
+                scores.append(score)
+                last_loc = last
+            if scores:
+                yield f"{user.lower()}|{date}|{'-'.join(scores)}|{_bytes_int(total)}"
+
+
+def sort_key(user, date):
+    """Order of games in data.csv: by player, case-insensitively, then date"""
+    return (user.strip().lower(), date.strip())
+
+
+def iter_csv_blocks(lines):
+    """Group data.csv lines into (sort key, [lines]) blocks, one per game.
+
+    Games are split the same way as in iter_csv_games, but every line is kept
+    verbatim; a row that doesn't parse is a block of its own.
+    """
+    block = None
+    ident = None
+    last_loc = 0
+    for line in lines:
+        if not line.strip() or line.startswith('user,'):
+            continue
+        if not line.endswith('\n'):
+            line += '\n'
+        fields = split_row(line)
+        loc = None
+        if fields is not None:
+            user, date, loc_num, score, emoji, total = fields
+            try:
+                loc = int(loc_num)
+                int(score)
+                int(total)
+            except ValueError:
+                loc = None
+        if loc is None:
+            if block is not None:
+                yield block
+                block = None
+            user, _, rest = line.partition(',')
+            yield sort_key(user, rest.split(',', 1)[0]), [line]
+            continue
+        if block is None or loc <= last_loc or (user, date, total) != ident:
+            if block is not None:
+                yield block
+            block = (sort_key(user, date), [])
+            ident = (user, date, total)
+        block[1].append(line)
+        last_loc = loc
+    if block is not None:
+        yield block
+
+
+class Unsorted(Exception):
+    """data.csv is not in sort_key order, so it can't be merged into"""
+
+
+def check_sorted(blocks):
+    """Pass blocks through, raising Unsorted if one sorts before its predecessor"""
+    last = None
+    for block in blocks:
+        if last is not None and block[0] < last:
+            raise Unsorted
+        last = block[0]
+        yield block
+
+
+@contextlib.contextmanager
+def locked(data_path):
+    """Hold an exclusive lock on data_path for the duration of the block.
+
+    The lock is taken on a sidecar file, since data.csv itself is replaced
+    when it is rewritten.
+    """
+    with open(state_path(data_path, 'data.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+@contextlib.contextmanager
+def atomic_write(path):
+    """Write a replacement for path as text; it only takes the file's place if the block succeeds.
+
+    The new content goes to a temporary file that is fsynced and renamed over
+    path, so readers see either the old or the new file.
+    """
+    tmp = f"{path}.tmp"
+    try:
+        with open(tmp, 'w', encoding='utf-8', newline='', buffering=1 << 20) as out:
+            yield out
+            out.flush()
+            os.fsync(out.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp)
+        raise
+    directory = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+def merge_games(data_path, games):
+    """Merge games into data_path in sort_key order as one atomic rewrite.
+
+    The new games are sorted and streamed together with the existing rows,
+    which are copied through verbatim; games that tie keep existing rows
+    first. A file that isn't sorted yet is sorted in full once. Call with the
+    lock held.
+    """
+    new_blocks = sorted(((sort_key(game[0], game[1]), [row + '\n' for row in game_rows(game)])
+                         for game in games), key=itemgetter(0))
+    if not new_blocks:
+        return
+    try:
+        with atomic_write(data_path) as out:
+            _write_merged(data_path, out, new_blocks, presorted=True)
+    except Unsorted:
+        with atomic_write(data_path) as out:
+            _write_merged(data_path, out, new_blocks, presorted=False)
+
+
+def _write_merged(data_path, out, new_blocks, presorted):
+    if os.path.exists(data_path):
+        src = open(data_path, 'r', encoding='utf-8', newline='')
+    else:
+        src = contextlib.nullcontext(iter(()))
+    with src as lines:
+        first = next(lines, None)
+        if first is not None and first.startswith('user,'):
+            out.write(first if first.endswith('\n') else first + '\n')
+        else:
+            out.write(HEADER + '\n')
+            lines = itertools.chain([first] if first is not None else [], lines)
+        existing = iter_csv_blocks(lines)
+        if presorted:
+            blocks = heapq.merge(check_sorted(existing), new_blocks, key=itemgetter(0))
+        else:
+            blocks = sorted(list(existing) + new_blocks, key=itemgetter(0))
+        for _, rows in blocks:
+            out.writelines(rows)
+
+
+def open_source(source):
+    """Open an export file for line-by-line reading, or stdin for '-'"""
+    if source == '-':
+        return contextlib.nullcontext(sys.stdin)
+    return open(source, 'r', encoding='utf-8')
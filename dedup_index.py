@@ -0,0 +1,153 @@
+"""Persistent on-disk index of the games already in data.csv.
+
+Both parsers check new games against this index instead of rescanning
+data.csv. The index remembers how much of data.csv it has seen: rows appended
+since then are indexed incrementally, and any other change to the file
+triggers a full rebuild.
+"""
+import os
+import sqlite3
+
+import ingest_stats
+from append_hook import AppendHook
+from datafile import (DATA_CSV, changed_since, file_state, game_key, game_rows, iter_game_keys, locked,
+                      merge_games, state_path)
+
+SCHEMA_VERSION = '1'
+# Keys per query in known()
+LOOKUP_BATCH = 500
+
+
+class DedupIndex:
+    """Set-like view of the game keys in data.csv, kept in a SQLite sidecar"""
+
+    def __init__(self, data_path=DATA_CSV, index_path=None):
+        self.data_path = data_path
+        self.index_path = index_path or state_path(data_path, 'dedup.sqlite')
+        self.conn = sqlite3.connect(self.index_path)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS games (key TEXT PRIMARY KEY) WITHOUT ROWID')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)')
+        self.sync()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def __contains__(self, key):
+        row = self.conn.execute('SELECT 1 FROM games WHERE key = ?', (key,)).fetchone()
+        return row is not None
+
+    def known(self, keys):
+        """The subset of keys already in the index, looked up a batch at a time"""
+        keys = list(keys)
+        found = set()
+        for i in range(0, len(keys), LOOKUP_BATCH):
+            batch = keys[i:i + LOOKUP_BATCH]
+            placeholders = ','.join('?' * len(batch))
+            found.update(key for key, in self.conn.execute(
+                f'SELECT key FROM games WHERE key IN ({placeholders})', batch))
+        return found
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM games').fetchone()[0]
+
+    def _seen_state(self):
+        meta = dict(self.conn.execute('SELECT name, value FROM meta'))
+        if meta.get('version') != SCHEMA_VERSION:
+            return None
+        return {
+            'size': int(meta['size']),
+            'mtime_ns': int(meta['mtime_ns']),
+            'fingerprint': meta['fingerprint'],
+        }
+
+    def _record_state(self):
+        state = file_state(self.data_path)
+        if state is None:
+            self.conn.execute('DELETE FROM meta')
+            return
+        state['version'] = SCHEMA_VERSION
+        self.conn.executemany('INSERT OR REPLACE INTO meta VALUES (?, ?)',
+                              ((name, str(value)) for name, value in state.items()))
+
+    def _index_from(self, offset):
+        """Index every game in data.csv from byte offset onwards"""
+        keys = ((key,) for key in iter_game_keys(self.data_path, offset))
+        self.conn.executemany('INSERT OR IGNORE INTO games VALUES (?)', keys)
+
+    def sync(self):
+        """Bring the index up to date with data.csv"""
+        offset = changed_since(self.data_path, self._seen_state())
+        if offset is None:
+            return
+        with self.conn:
+            if offset == 0:
+                self.conn.execute('DELETE FROM games')
+            if os.path.exists(self.data_path):
+                # After a plain append only the new tail is read
+                self._index_from(offset)
+            self._record_state()
+
+    def add_games(self, games):
+        """Record games that were just appended to data.csv"""
+        with self.conn:
+            self.conn.executemany('INSERT OR IGNORE INTO games VALUES (?)',
+                                  ((game_key(game),) for game in games))
+            self._record_state()
+
+    def append(self, games):
+        """Merge the games not yet in data.csv into it under its lock; returns them.
+
+        The index is synced and checked again once the lock is held, so
+        overlapping ingests can't write the same game twice. The derived
+        state is updated by an AppendHook.
+        """
+        with locked(self.data_path):
+            self.sync()
+            new = list(iter_new_games(games, self))
+            hook = AppendHook(self.data_path)
+            merge_games(self.data_path, new)
+            self.add_games(new)
+            hook.merged(new)
+        return new
+
+
+def iter_new_games(games, index, stats=None):
+    """Yield games that are neither in the index nor repeated earlier in this run"""
+    seen = set()
+    for game in games:
+        key = game_key(game)
+        if key in seen:
+            if stats is not None:
+                stats.count('duplicates.in_run')
+        elif key in index:
+            if stats is not None:
+                stats.count('duplicates.in_data')
+        else:
+            seen.add(key)
+            yield game
+
+
+def output_new_games(games, index, append=False, stats=None):
+    """Print CSV rows for the new games, or with append merge them into the index's data"""
+    new_games = ingest_stats.timed(stats, 'dedup', iter_new_games(ingest_stats.timed(stats, 'parse', games),
+                                                                  index, stats))
+    with ingest_stats.stage(stats, 'output'):
+        if append:
+            new = index.append(list(new_games))
+            if stats is not None:
+                stats.count('games_written', len(new))
+                stats.count('rows_written', sum(len(game[2]) for game in new))
+            print(f"Appended {len(new)} new games to {index.data_path}")
+            return
+        for game in new_games:
+            for row in game_rows(game):
+                print(row)
+            if stats is not None:
+                stats.count('games_written')
+                stats.count('rows_written', len(game[2]))
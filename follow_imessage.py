@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""Follow a growing iMessage export, or a drop directory of exports.
+
+Each file is polled with a single stat() call, so an idle follower costs
+next to nothing. When a file grows, only the complete lines appended since
+its checkpoint are read and fed to an IMessageParser restored from the
+checkpoint, so a game whose user and date lines arrived before the last
+poll is still assembled. A last line without a newline is read once the
+file has stopped growing for a poll, or straight away with --once. The checkpoint (byte offset, a fingerprint of the
+bytes before it, and the parser state) is saved after the new games are
+emitted; a file that was rewritten rather than appended to is re-read from
+the start, with the dedup index dropping games already seen.
+"""
+import argparse
+import fnmatch
+import io
+import json
+import os
+import sys
+import time
+
+from datafile import DATA_CSV, changed_since, fingerprint, state_path
+from dedup_index import output_new_games
+from parse_imessage import IMessageParser
+from partitions import add_partitions_argument, open_index
+from roster import add_roster_argument, load_roster
+from tokenizer import set_roster
+
+POLL_SECONDS = 2.0
+# Bytes read per step, so a large backlog is worked through in bounded memory
+READ_BYTES = 8 << 20
+
+
+def load_checkpoints(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_checkpoints(path, checkpoints):
+    """Persist all checkpoints, replacing the file atomically"""
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(checkpoints, f, indent=2, sort_keys=True, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def read_appended(path, checkpoint, final=False):
+    """Parse the next complete lines appended to path since checkpoint.
+
+    With final, the writer is taken to be done, so a last line without a
+    newline is complete too. Returns (games, checkpoint), the checkpoint
+    advanced past the last line read, or None for the checkpoint if there
+    was nothing new.
+    """
+    seen = checkpoint['file'] if checkpoint else None
+    offset = changed_since(path, seen)
+    if offset is None:
+        return [], None
+    if offset == 0 or not checkpoint:
+        parser = IMessageParser()
+    else:
+        parser = IMessageParser.from_state(checkpoint['parser'])
+
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(READ_BYTES)
+    # Leave a partly written last line for the next poll
+    end = data.rfind(b'\n') + 1
+    if final and len(data) < READ_BYTES:
+        end = len(data)
+    if end == 0:
+        if len(data) < READ_BYTES:
+            return [], None
+        end = len(data)
+
+    games = []
+    for line in io.StringIO(data[:end].decode('utf-8', errors='replace'), newline=None):
+        game = parser.feed(line)
+        if game is not None:
+            games.append(game)
+
+    size = offset + end
+    return games, {
+        'file': {'size': size, 'mtime_ns': stat.st_mtime_ns, 'fingerprint': fingerprint(path, size)},
+        'parser': parser.get_state(),
+    }
+
+
+def list_sources(target, pattern):
+    """The export files to follow: target itself, or the matching files in a drop directory"""
+    if not os.path.isdir(target):
+        return [os.path.abspath(target)] if os.path.exists(target) else []
+    names = sorted(name for name in os.listdir(target) if fnmatch.fnmatch(name, pattern))
+    return [os.path.abspath(os.path.join(target, name)) for name in names]
+
+
+class Follower:
+    """Polls export files and emits the games appended to them"""
+
+    def __init__(self, index, checkpoint_path, append=False, once=False):
+        self.index = index
+        self.checkpoint_path = checkpoint_path
+        self.checkpoints = load_checkpoints(checkpoint_path)
+        self.append = append
+        # Read everything there is, including a last line without a newline
+        self.once = once
+        # (size, mtime_ns) of each file at the last poll
+        self.stats = {}
+
+    def poll(self, paths):
+        """Process whatever was appended to paths; returns the number of games found"""
+        found = 0
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            key = (stat.st_size, stat.st_mtime_ns)
+            final = self.once
+            if self.stats.get(path) == key:
+                checkpoint = self.checkpoints.get(path)
+                if checkpoint and checkpoint['file']['size'] >= stat.st_size:
+                    continue
+                # Unchanged since the last poll, so whatever is left after
+                # the last newline is a finished line
+                final = True
+            while True:
+                games, checkpoint = read_appended(path, self.checkpoints.get(path), final)
+                if checkpoint is None:
+                    break
+                if games:
+                    self.emit(games)
+                    found += len(games)
+                self.checkpoints[path] = checkpoint
+                save_checkpoints(self.checkpoint_path, self.checkpoints)
+            self.stats[path] = key
+        return found
+
+    def emit(self, games):
+        self.index.sync()
+        output_new_games(games, self.index, self.append)
+        sys.stdout.flush()
+
+    def forget_missing(self, directory):
+        """Drop the checkpoints of files that have left a drop directory"""
+        prefix = os.path.abspath(directory) + os.sep
+        gone = [path for path in self.checkpoints
+                if path.startswith(prefix) and not os.path.exists(path)]
+        for path in gone:
+            del self.checkpoints[path]
+            self.stats.pop(path, None)
+        if gone:
+            save_checkpoints(self.checkpoint_path, self.checkpoints)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Follow a growing iMessage export and emit new MapTap games')
+    parser.add_argument('target', help='export file to follow, or a directory that exports are dropped into')
+    parser.add_argument('--pattern', default='*.txt', help='file name pattern in a drop directory')
+    parser.add_argument('--data', default=DATA_CSV, help='existing data file used for duplicate checks')
+    parser.add_argument('--append', action='store_true',
+                        help='merge new games into the data file instead of printing rows')
+    add_partitions_argument(parser)
+    add_roster_argument(parser)
+    parser.add_argument('--checkpoint', help='checkpoint file (default: .maptap/follow.json next to the data)')
+    parser.add_argument('--interval', type=float, default=POLL_SECONDS, help='seconds between polls')
+    parser.add_argument('--once', action='store_true', help='process what is there and exit')
+    args = parser.parse_args(argv)
+    set_roster(load_roster(args.roster))
+
+    checkpoint_path = args.checkpoint or state_path(args.data, 'follow.json')
+    with open_index(args.data, args.partitions) as index:
+        follower = Follower(index, checkpoint_path, args.append, args.once)
+        try:
+            while True:
+                follower.poll(list_sources(args.target, args.pattern))
+                if args.once:
+                    break
+                if os.path.isdir(args.target):
+                    follower.forget_missing(args.target)
+                time.sleep(args.interval)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""Compact columnar store of the game history.
+
+data.csv repeats the user, date and total on each of a game's five rows. The
+store keeps one record per game instead: dictionary-encoded user, date and
+emoji ids plus a fixed-width block of five location scores, laid out as
+contiguous columns in a single binary file that is memory-mapped on load.
+The dictionaries live in a JSON file next to it.
+
+Rows that don't fit the record layout (malformed or out-of-sequence rows)
+are kept verbatim with their position, so exporting back to CSV reproduces
+data.csv byte for byte and server.js keeps working unchanged.
+"""
+import argparse
+import json
+import mmap
+import os
+import struct
+from array import array
+
+from datafile import DATA_CSV, HEADER, split_row
+
+MAGIC = b'MTGSTOR1'
+HEADER_STRUCT = struct.Struct('<8sQ')
+LOCATIONS = 5
+# (name, array typecode, values per game), widest first so every column
+# stays aligned after the 16-byte header
+COLUMNS = (
+    ('user', 'I', 1),
+    ('date', 'I', 1),
+    ('total', 'i', 1),
+    ('scores', 'h', LOCATIONS),
+    ('emojis', 'H', LOCATIONS),
+    ('nloc', 'B', 1),
+)
+
+
+def columns_to_numpy(columns):
+    """NumPy views of COLUMNS-shaped arrays, sharing their memory; scores/emojis are (n, 5)"""
+    import numpy as np
+
+    arrays = {}
+    for name, code, width in COLUMNS:
+        column = np.frombuffer(columns[name], dtype=code)
+        arrays[name] = column.reshape(-1, width) if width > 1 else column
+    return arrays
+
+
+def store_paths(path):
+    """Binary column file and dictionary file of a store directory"""
+    return os.path.join(path, 'games.bin'), os.path.join(path, 'dicts.json')
+
+
+class Encoder:
+    """Dictionary encoder assigning ids in first-seen order"""
+
+    def __init__(self, values=()):
+        self.values = list(values)
+        self.ids = {value: i for i, value in enumerate(self.values)}
+
+    def encode(self, value):
+        value_id = self.ids.get(value)
+        if value_id is None:
+            value_id = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+
+class GameStore:
+    """One record per game in typed columns, with dictionaries for decoding"""
+
+    def __init__(self, columns, users, dates, emojis, extras=(), header=HEADER):
+        self.columns = columns
+        self.users = users
+        self.dates = dates
+        self.emojis = emojis
+        self.extras = [tuple(extra) for extra in extras]
+        self.header = header
+        self._mmap = None
+
+    def __len__(self):
+        return len(self.columns['user'])
+
+    @classmethod
+    def from_lines(cls, lines):
+        """Encode data.csv lines, keeping rows that don't fit as verbatim extras"""
+        users, dates = Encoder(), Encoder()
+        emojis = Encoder([''])
+        columns = {name: array(code) for name, code, _ in COLUMNS}
+        extras = []
+        header = None
+        row_index = 0
+        # Game being built as (user, date, total, locations), or None
+        current = None
+
+        def flush():
+            if current is None:
+                return
+            user, date, total, scores = current
+            columns['user'].append(users.encode(user))
+            columns['date'].append(dates.encode(date))
+            columns['total'].append(int(total))
+            columns['nloc'].append(len(scores))
+            padded = scores + [(0, '')] * (LOCATIONS - len(scores))
+            columns['scores'].extend(int(score) for score, _ in padded)
+            columns['emojis'].extend(emojis.encode(emoji) for _, emoji in padded)
+
+        for i, line in enumerate(lines):
+            line = line.rstrip('\n')
+            if i == 0 and line.startswith('user,'):
+                header = line
+                continue
+            fields = split_row(line)
+            fits = False
+            if fields is not None:
+                user, date, loc_num, score, emoji, total = fields
+                try:
+                    loc, value, total_value = int(loc_num), int(score), int(total)
+                    # Only rows that render back to exactly the same text fit
+                    fits = line == f"{user},{date},{loc},{value},{emoji},{total_value}" and \
+                        1 <= loc <= LOCATIONS and -2**15 <= value < 2**15 and -2**31 <= total_value < 2**31
+                except ValueError:
+                    pass
+            if not fits:
+                extras.append((row_index, line))
+            elif current is not None and loc == len(current[3]) + 1 and \
+                    (user, date, total) == current[:3]:
+                current[3].append((score, emoji))
+            elif loc == 1:
+                flush()
+                current = (user, date, total, [(score, emoji)])
+            else:
+                extras.append((row_index, line))
+            row_index += 1
+        flush()
+        return cls(columns, users.values, dates.values, emojis.values, extras, header)
+
+    @classmethod
+    def from_csv(cls, path=DATA_CSV):
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            return cls.from_lines(f)
+
+    def save(self, path):
+        """Write the column file and dictionaries, replacing any existing store"""
+        os.makedirs(path, exist_ok=True)
+        bin_path, dict_path = store_paths(path)
+        tmp = f"{bin_path}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(HEADER_STRUCT.pack(MAGIC, len(self)))
+            for name, _, _ in COLUMNS:
+                self.columns[name].tofile(f)
+        os.replace(tmp, bin_path)
+        tmp = f"{dict_path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({
+                'header': self.header,
+                'users': self.users,
+                'dates': self.dates,
+                'emojis': self.emojis,
+                'extras': self.extras,
+            }, f, ensure_ascii=False)
+        os.replace(tmp, dict_path)
+
+    @classmethod
+    def load(cls, path):
+        """Memory-map a saved store; columns are zero-copy views of the file"""
+        bin_path, dict_path = store_paths(path)
+        with open(dict_path, 'r', encoding='utf-8') as f:
+            dicts = json.load(f)
+        with open(bin_path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = HEADER_STRUCT.unpack_from(mapped)
+        if magic != MAGIC:
+            raise ValueError(f"{bin_path} is not a game store")
+        view = memoryview(mapped)
+        columns = {}
+        offset = HEADER_STRUCT.size
+        for name, code, width in COLUMNS:
+            size = array(code).itemsize * width * count
+            columns[name] = view[offset:offset + size].cast(code)
+            offset += size
+        store = cls(columns, dicts['users'], dicts['dates'], dicts['emojis'],
+                    dicts['extras'], dicts['header'])
+        store._mmap = (mapped, view)
+        return store
+
+    def to_numpy(self):
+        """Columns as NumPy arrays sharing the store's memory; scores/emojis are (n, 5)"""
+        return columns_to_numpy(self.columns)
+
+    def iter_games(self):
+        """Yield (user, date, [(score, emoji), ...], total) games"""
+        cols = self.columns
+        for i in range(len(self)):
+            base = i * LOCATIONS
+            scores = [(str(cols['scores'][base + k]), self.emojis[cols['emojis'][base + k]])
+                      for k in range(cols['nloc'][i])]
+            yield (self.users[cols['user'][i]], self.dates[cols['date'][i]], scores, str(cols['total'][i]))
+
+    def iter_lines(self):
+        """Yield the data.csv lines (without newlines) in their original order"""
+        if self.header is not None:
+            yield self.header
+        extras = iter(self.extras)
+        next_extra = next(extras, None)
+        row_index = 0
+        for user, date, scores, total in self.iter_games():
+            for loc_num, (score, emoji) in enumerate(scores, 1):
+                while next_extra is not None and next_extra[0] == row_index:
+                    yield next_extra[1]
+                    row_index += 1
+                    next_extra = next(extras, None)
+                yield f"{user},{date},{loc_num},{score},{emoji},{total}"
+                row_index += 1
+        while next_extra is not None:
+            yield next_extra[1]
+            next_extra = next(extras, None)
+
+    def write_csv(self, path):
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8', newline='') as f:
+            for line in self.iter_lines():
+                f.write(line + '\n')
+        os.replace(tmp, path)
+
+    def close(self):
+        if self._mmap is not None:
+            mapped, view = self._mmap
+            for column in self.columns.values():
+                column.release()
+            view.release()
+            mapped.close()
+            self._mmap = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert between data.csv and the columnar game store')
+    sub = parser.add_subparsers(dest='command', required=True)
+    build = sub.add_parser('build', help='encode a CSV file into a store directory')
+    build.add_argument('csv', nargs='?', default=DATA_CSV)
+    build.add_argument('store', nargs='?', default='data.store')
+    export = sub.add_parser('export', help='write a store back out as CSV')
+    export.add_argument('store', nargs='?', default='data.store')
+    export.add_argument('csv', nargs='?', default=DATA_CSV)
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        store = GameStore.from_csv(args.csv)
+        store.save(args.store)
+        print(f"{len(store)} games, {len(store.users)} users, {len(store.emojis)} emojis, "
+              f"{len(store.extras)} verbatim rows")
+    else:
+        store = GameStore.load(args.store)
+        try:
+            store.write_csv(args.csv)
+        finally:
+            store.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""Incremental MapTap ingest straight from a Messages chat.db SQLite file.
+
+Only messages past the stored ROWID watermark are read. Each message's
+text lines are fed through the same IMessageParser used for text exports,
+starting from its sender as the player, so a nightly run costs time in
+proportion to the new messages rather than the whole chat history.
+"""
+import argparse
+import json
+import os
+import sqlite3
+
+from datafile import DATA_CSV, state_path
+from dedup_index import output_new_games
+from parse_imessage import IMessageParser
+from partitions import add_partitions_argument, open_index
+from roster import add_roster_argument, load_roster
+from tokenizer import get_roster, set_roster
+
+MESSAGE_QUERY = """
+    SELECT m.ROWID, m.date, m.text, m.is_from_me, h.id
+    FROM message m
+    LEFT JOIN handle h ON h.ROWID = m.handle_id
+    WHERE m.ROWID > ?
+    ORDER BY m.ROWID
+"""
+
+CHAT_MESSAGE_QUERY = """
+    SELECT m.ROWID, m.date, m.text, m.is_from_me, h.id
+    FROM message m
+    JOIN chat_message_join cmj ON cmj.message_id = m.ROWID
+    JOIN chat c ON c.ROWID = cmj.chat_id
+    LEFT JOIN handle h ON h.ROWID = m.handle_id
+    WHERE m.ROWID > ? AND (c.chat_identifier = ? OR c.display_name = ?)
+    ORDER BY m.ROWID
+"""
+
+
+def watermark_key(db_path, chat=None):
+    """Key a watermark by database file and optional chat"""
+    key = os.path.abspath(db_path)
+    return f"{key}#{chat}" if chat else key
+
+
+def load_watermark(path, key):
+    """Return the stored {'rowid', 'date'} watermark for key"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            marks = json.load(f)
+    except (OSError, ValueError):
+        marks = {}
+    return marks.get(key, {'rowid': 0, 'date': 0})
+
+
+def save_watermark(path, key, mark):
+    """Persist the watermark for key, replacing the file atomically"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            marks = json.load(f)
+    except (OSError, ValueError):
+        marks = {}
+    marks[key] = mark
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(marks, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def load_contacts(path):
+    """Load a {handle: display name} mapping, e.g. {"+15551234567": "David Ellis"}"""
+    if not path:
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def iter_messages(conn, after_rowid, chat=None):
+    """Yield (rowid, date, text, is_from_me, handle) for messages past after_rowid"""
+    if chat:
+        cursor = conn.execute(CHAT_MESSAGE_QUERY, (after_rowid, chat, chat))
+    else:
+        cursor = conn.execute(MESSAGE_QUERY, (after_rowid,))
+    yield from cursor
+
+
+def iter_db_games(conn, mark, contacts=None, me=None, chat=None):
+    """Yield parsed games from new messages, advancing mark in place.
+
+    The sender of each message is known here, so every message starts from a
+    fresh parser with its sender as the player instead of inheriting the
+    previous message's state. Messages from senders that aren't on the
+    roster (or are excluded, or have no contact name) are skipped.
+    """
+    contacts = contacts or {}
+    roster = get_roster()
+    for rowid, date, text, is_from_me, handle in iter_messages(conn, mark['rowid'], chat):
+        mark['rowid'] = rowid
+        mark['date'] = max(mark['date'], date or 0)
+        # Attachments and rich-text-only messages have no plain text
+        if not text:
+            continue
+        sender = me if is_from_me else contacts.get(handle)
+        player = roster.find(sender.lower(), sender) if sender else None
+        if player is None or player[1]:
+            continue
+        parser = IMessageParser()
+        parser.current_user = player[0]
+        for line in text.split('\n'):
+            game = parser.feed(line)
+            if game is not None:
+                yield game
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Extract new MapTap scores from a Messages chat.db')
+    parser.add_argument('database', help='path to chat.db (or a copy of it)')
+    parser.add_argument('--chat', help='only read messages from this chat identifier or display name')
+    parser.add_argument('--contacts', help='JSON file mapping handles (phone/email) to player names')
+    parser.add_argument('--me', help='player name for messages sent from this device')
+    parser.add_argument('--watermark', help='file holding the last ingested message ROWID/date '
+                        '(default: .maptap/imessage_watermark.json next to the data)')
+    parser.add_argument('--data', default=DATA_CSV, help='existing data file used for duplicate checks')
+    parser.add_argument('--append', action='store_true',
+                        help='merge new games into the data file instead of printing rows')
+    add_partitions_argument(parser)
+    add_roster_argument(parser)
+    args = parser.parse_args(argv)
+    set_roster(load_roster(args.roster))
+
+    contacts = load_contacts(args.contacts)
+    watermark_path = args.watermark or state_path(args.data, 'imessage_watermark.json')
+    key = watermark_key(args.database, args.chat)
+    mark = load_watermark(watermark_path, key)
+
+    conn = sqlite3.connect(f"file:{args.database}?mode=ro", uri=True)
+    try:
+        with open_index(args.data, args.partitions) as index:
+            games = iter_db_games(conn, mark, contacts, args.me, args.chat)
+            output_new_games(games, index, args.append)
+    finally:
+        conn.close()
+
+    save_watermark(watermark_path, key, mark)
+
+
+if __name__ == '__main__':
+    main()
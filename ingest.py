@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""Ingest several score sources at once.
+
+Each source (an iMessage export or a digest file) is parsed in a process of
+its own. Games are sent in batches through one bounded queue to this
+process, which is the only writer. The writer checks each batch against the
+dedup index as it arrives, so that work overlaps the parsing. At the end it
+drops games repeated across sources, in source order, and writes everything
+in one batch: a single merge into data.csv with --append, otherwise the
+rows on stdout. The result is what running the sources one after another in
+the given order would produce, but the wall time is about that of the
+slowest source. A source given as '-' is stdin, which only this process
+can read, so it is parsed in a thread here instead.
+
+    python3 ingest.py --export phone.txt --export laptop.txt --digest digest.txt --append
+"""
+import argparse
+import multiprocessing
+import sys
+import threading
+import time
+from queue import Empty
+
+import ingest_stats
+from datafile import DATA_CSV, game_rows, open_source
+from parse_entries import iter_entry_batches
+from parse_imessage import iter_game_batches
+from partitions import add_partitions_argument, open_index
+from roster import add_roster_argument, load_roster
+from tokenizer import get_roster, set_roster
+
+EXPORT = 'export'
+DIGEST = 'digest'
+# Messages the queue holds before readers wait; each is a records.GameBatch
+# of up to records.BATCH_GAMES games
+QUEUE_BATCHES = 64
+
+# Queue message kinds
+GAMES = 'games'
+DONE = 'done'
+FAILED = 'failed'
+
+
+def read_source(number, kind, path, roster, queue, counting):
+    """Reader process: parse one source and send its games to the writer in batches"""
+    set_roster(roster)
+    stats = ingest_stats.IngestStats() if counting else None
+    start = time.perf_counter()
+    try:
+        with open_source(path) as f:
+            batches = (iter_game_batches(f, stats=stats) if kind == EXPORT
+                       else iter_entry_batches(f, stats=stats))
+            count = 0
+            for batch in batches:
+                queue.put((number, GAMES, batch))
+                count += len(batch)
+    except Exception as exc:
+        queue.put((number, FAILED, f"{path}: {exc}"))
+        return
+    queue.put((number, DONE, {
+        'games': count,
+        'seconds': time.perf_counter() - start,
+        'counters': stats.counters if stats is not None else {},
+    }))
+
+
+def ingest(sources, index, stats=None):
+    """Parse (kind, path) sources concurrently; returns (new games in source order, per-source summaries)"""
+    queue = multiprocessing.Queue(QUEUE_BATCHES)
+    readers = []
+    for number, (kind, path) in enumerate(sources):
+        # Child processes don't share this process's stdin
+        reader = threading.Thread if path == '-' else multiprocessing.Process
+        readers.append(reader(target=read_source, daemon=True,
+                              args=(number, kind, path, get_roster(), queue, stats is not None)))
+    for reader in readers:
+        reader.start()
+
+    # Games not yet in the index as (key, batch, position), kept per source
+    # so the final order doesn't depend on which reader was fastest
+    candidates = [[] for _ in sources]
+    summaries = [None] * len(sources)
+    remaining = len(sources)
+    try:
+        while remaining:
+            try:
+                number, kind, payload = queue.get(timeout=1)
+            except Empty:
+                # A reader that died without reporting won't send anything more
+                for (_, path), reader, summary in zip(sources, readers, summaries):
+                    if summary is None and getattr(reader, 'exitcode', None):
+                        raise SystemExit(f"error reading {path}: reader exited with code {reader.exitcode}")
+                continue
+            if kind == GAMES:
+                with ingest_stats.stage(stats, 'dedup'):
+                    keys = payload.keys()
+                    known = index.known(keys)
+                    for i, key in enumerate(keys):
+                        if key in known:
+                            if stats is not None:
+                                stats.count('duplicates.in_data')
+                        else:
+                            candidates[number].append((key, payload, i))
+            elif kind == DONE:
+                summaries[number] = payload
+                remaining -= 1
+                if stats is not None:
+                    for name, value in payload['counters'].items():
+                        stats.count(name, value)
+            else:
+                raise SystemExit(f"error reading {payload}")
+    finally:
+        for reader in readers:
+            if reader.is_alive() and remaining:
+                if isinstance(reader, threading.Thread):
+                    # A daemon thread can't be stopped, and may be blocked
+                    # on the full queue; it ends with the process
+                    continue
+                reader.terminate()
+            reader.join()
+
+    seen = set()
+    new = []
+    for games in candidates:
+        for key, batch, i in games:
+            if key in seen:
+                if stats is not None:
+                    stats.count('duplicates.in_run')
+            else:
+                seen.add(key)
+                new.append(batch.game(i))
+    return new, summaries
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ingest several iMessage exports and digest files concurrently')
+    parser.add_argument('--export', action='append', default=[], help='iMessage export file (repeatable)')
+    parser.add_argument('--digest', action='append', default=[],
+                        help='"Month D: Name: scores, Final: N" digest file (repeatable)')
+    parser.add_argument('--data', default=DATA_CSV, help='existing data file used for duplicate checks')
+    parser.add_argument('--append', action='store_true',
+                        help='merge new games into the data file instead of printing rows')
+    add_partitions_argument(parser)
+    add_roster_argument(parser)
+    ingest_stats.add_arguments(parser)
+    args = parser.parse_args(argv)
+    sources = [(EXPORT, path) for path in args.export] + [(DIGEST, path) for path in args.digest]
+    if not sources:
+        parser.error('give at least one --export or --digest source')
+    if [path for _, path in sources].count('-') > 1:
+        parser.error("only one source can be '-' (stdin)")
+    set_roster(load_roster(args.roster))
+    stats = ingest_stats.from_args(args)
+
+    start = time.perf_counter()
+    with ingest_stats.profiled(args.profile):
+        with ingest_stats.stage(stats, 'index'):
+            index = open_index(args.data, args.partitions)
+        with index:
+            new, summaries = ingest(sources, index, stats)
+            with ingest_stats.stage(stats, 'output'):
+                if args.append:
+                    new = index.append(new)
+                    print(f"Appended {len(new)} new games to {index.data_path}")
+                else:
+                    for game in new:
+                        for row in game_rows(game):
+                            print(row)
+            if stats is not None:
+                stats.count('games_written', len(new))
+                stats.count('rows_written', sum(len(game[2]) for game in new))
+
+    for (kind, path), summary in zip(sources, summaries):
+        print(f"{path} ({kind}): {summary['games']} games in {summary['seconds']:.2f}s", file=sys.stderr)
+    print(f"Ingested {len(sources)} sources in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+    ingest_stats.finish(stats, args)
+
+
+if __name__ == '__main__':
+    main()
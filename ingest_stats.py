@@ -0,0 +1,148 @@
+"""Counters, stage timings and profiling for ingest runs.
+
+Parsers, the dedup step and the output step count what they see into an
+IngestStats (lines read, line kinds, rejected lines by reason, duplicates,
+rows written). Stages are timed by wrapping the generators that make up
+the pipeline: time spent producing an item is charged to the innermost
+stage that is running, so each stage's time excludes the stages feeding
+it. Nothing is counted or timed unless a run asks for stats.
+"""
+import contextlib
+import cProfile
+import json
+import sys
+import time
+
+
+class IngestStats:
+    """Named counters plus per-stage item counts and exclusive timings"""
+
+    def __init__(self):
+        self.counters = {}
+        self.stages = {}
+        self._stack = []
+        self._last = time.perf_counter()
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def _switch(self):
+        """Charge the time since the last switch to the running stage"""
+        now = time.perf_counter()
+        if self._stack:
+            self.stages[self._stack[-1]]['seconds'] += now - self._last
+        self._last = now
+
+    def _enter(self, name):
+        self._switch()
+        self.stages.setdefault(name, {'seconds': 0.0, 'items': 0})
+        self._stack.append(name)
+
+    def _exit(self):
+        self._switch()
+        self._stack.pop()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time a block as a stage"""
+        self._enter(name)
+        try:
+            yield
+        finally:
+            self._exit()
+
+    def timed(self, name, iterable):
+        """Pass items through, timing the work of producing each one as a stage"""
+        it = iter(iterable)
+        while True:
+            self._enter(name)
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                self._exit()
+            self.stages[name]['items'] += 1
+            yield item
+
+    def report(self):
+        stages = {}
+        for name, stage in self.stages.items():
+            seconds = stage['seconds']
+            stages[name] = {
+                'seconds': round(seconds, 6),
+                'items': stage['items'],
+                'items_per_sec': round(stage['items'] / seconds, 1) if seconds else None,
+            }
+        total = sum(stage['seconds'] for stage in self.stages.values())
+        lines = self.counters.get('lines_read', 0)
+        return {
+            'counters': dict(sorted(self.counters.items())),
+            'stages': stages,
+            'total_seconds': round(total, 6),
+            'lines_per_sec': round(lines / total, 1) if total and lines else None,
+        }
+
+    def print_report(self, file=sys.stderr):
+        report = self.report()
+        print('Counters:', file=file)
+        for name, value in report['counters'].items():
+            print(f"  {name}: {value}", file=file)
+        print('Stages:', file=file)
+        for name, stage in report['stages'].items():
+            rate = f", {stage['items_per_sec']:.0f}/s" if stage['items_per_sec'] else ''
+            print(f"  {name}: {stage['seconds'] * 1000:.1f} ms, {stage['items']} items{rate}", file=file)
+        if report['lines_per_sec']:
+            print(f"Total: {report['total_seconds'] * 1000:.1f} ms, {report['lines_per_sec']:.0f} lines/s", file=file)
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+            f.write('\n')
+
+
+def stage(stats, name):
+    """stats.stage(name), or a no-op without stats"""
+    return stats.stage(name) if stats is not None else contextlib.nullcontext()
+
+
+def timed(stats, name, iterable):
+    """stats.timed(name, iterable), or iterable itself without stats"""
+    return stats.timed(name, iterable) if stats is not None else iterable
+
+
+def add_arguments(parser):
+    """Add the --stats, --stats-json and --profile options to an ingest's argument parser"""
+    parser.add_argument('--stats', action='store_true', help='print counters and stage timings to stderr')
+    parser.add_argument('--stats-json', help='write counters and stage timings to this JSON file')
+    parser.add_argument('--profile', help='write a cProfile dump of the run to this file (see python -m pstats)')
+
+
+def from_args(args):
+    """An IngestStats if the arguments ask for stats, else None"""
+    return IngestStats() if args.stats or args.stats_json else None
+
+
+def finish(stats, args):
+    """Print and/or write the stats as the arguments ask"""
+    if stats is None:
+        return
+    if args.stats:
+        stats.print_report()
+    if args.stats_json:
+        stats.write_json(args.stats_json)
+
+
+@contextlib.contextmanager
+def profiled(path):
+    """Profile the block with cProfile and dump the stats to path; does nothing without a path"""
+    if not path:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
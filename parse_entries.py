@@ -1,18 +1,15 @@
 #!/usr/bin/env python3
-import re
-import sys
+import argparse
+import io
 
-# Read existing entries to check duplicates
-existing = set()
-try:
-    with open('data.csv', 'r') as f:
-        for line in f:
-            if ',' in line and not line.startswith('user'):
-                parts = line.strip().split(',')
-                if len(parts) >= 2:
-                    existing.add((parts[0].strip(), parts[1].strip()))
-except:
-    pass
+import ingest_stats
+from chunk_cache import CACHE_MB, LINE_END, ChunkCache, iter_chunks, open_binary, roster_fingerprint
+from datafile import DATA_CSV, open_source
+from dedup_index import output_new_games
+from partitions import add_partitions_argument, open_index
+from records import BATCH_GAMES, iter_batches
+from roster import add_roster_argument, load_roster
+from tokenizer import get_roster, parse_digest_line, set_roster
 
 # All entries from the text
 entries_text = """
@@ -164,34 +161,86 @@ Dec 2: Abigail Jenquist: 94/ 89, 61. 84* 668, Final: 755
 Dec 2: Joshua Jenquist: 95/ 92$ 96" 93$ 62', Final: 844
 """
 
-# Parse and format entries
-new_rows = []
-for line in entries_text.strip().split('\n'):
-    if not line.strip():
-        continue
-    # Parse: Oct 29: David Ellis: 99! 96" 98" 24❄ 815, Final: 706
-    match = re.match(r'(Oct|Nov|Dec|October|November|December)\s+(\d+):\s*([^:]+):\s*([^,]+),\s*Final:\s*(\d+)', line)
-    if match:
-        month_str = match.group(1)
-        day = match.group(2)
-        user = match.group(3).strip()
-        scores_str = match.group(4).strip()
-        final = match.group(5)
-        
-        # Convert month
-        months = {'Oct': '10', 'October': '10', 'Nov': '11', 'November': '11', 'Dec': '12', 'December': '12'}
-        month = months.get(month_str, '12')
-        date = f"2025-{month}-{day.zfill(2)}"
-        
-        # Parse scores
-        score_pattern = r'(\d+)([^\d\s]{1,3})'
-        scores = re.findall(score_pattern, scores_str)
-        
-        if len(scores) == 5 and (user, date) not in existing:
-            for i, (score, emoji) in enumerate(scores, 1):
-                new_rows.append(f"{user},{date},{i},{score},{emoji},{final}")
 
-# Output new rows
-for row in new_rows:
-    print(row)
+def iter_entries(lines, stats=None):
+    """Yield a game for every well-formed digest line"""
+    for line in lines:
+        if stats is not None:
+            stats.count('lines_read')
+        if not line.strip():
+            if stats is not None:
+                stats.count('lines.blank')
+            continue
+        game = parse_digest_line(line, stats)
+        if game is not None:
+            if stats is not None:
+                stats.count('games_parsed')
+            yield game
 
+
+def iter_entry_batches(lines, size=BATCH_GAMES, stats=None):
+    """iter_entries() grouped into compact GameBatches of up to size games"""
+    return iter_batches(iter_entries(lines, stats), size)
+
+
+def iter_entries_cached(f, cache, stats=None):
+    """iter_entries() over a binary file, parsing only chunks the cache hasn't seen"""
+    for data in iter_chunks(f, LINE_END):
+        key = cache.key(data)
+        value = cache.get(key)
+        if value is None:
+            # Counters are cached along with the games, so a run with stats
+            # reports the same numbers whether or not the chunk was parsed
+            counted = ingest_stats.IngestStats()
+            games = list(iter_entries(io.StringIO(data.decode('utf-8'), newline=None), counted))
+            counters = counted.counters
+            cache.put(key, {'games': games, 'counters': counters})
+        else:
+            games = [(user, date, [tuple(pair) for pair in scores], final)
+                     for user, date, scores, final in value['games']]
+            counters = value['counters']
+        if stats is not None:
+            for name, n in counters.items():
+                stats.count(name, n)
+        yield from games
+    if stats is not None:
+        stats.count('cache.hits', cache.hits)
+        stats.count('cache.misses', cache.misses)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert "Month D: Name: scores, Final: N" digests to CSV rows')
+    parser.add_argument('source', nargs='?',
+                        help="digest file to read, or '-' for stdin (default: built-in entries)")
+    parser.add_argument('--data', default=DATA_CSV, help='existing data file used for duplicate checks')
+    parser.add_argument('--append', action='store_true',
+                        help='merge new games into the data file instead of printing rows')
+    add_partitions_argument(parser)
+    add_roster_argument(parser)
+    parser.add_argument('--cache', action='store_true',
+                        help='reuse parse results for chunks of the digest seen in earlier runs')
+    parser.add_argument('--cache-mb', type=int, default=CACHE_MB,
+                        help=f'size limit of the chunk cache in MB (default: {CACHE_MB})')
+    ingest_stats.add_arguments(parser)
+    args = parser.parse_args(argv)
+    set_roster(load_roster(args.roster))
+    stats = ingest_stats.from_args(args)
+
+    with ingest_stats.profiled(args.profile):
+        with ingest_stats.stage(stats, 'index'):
+            index = open_index(args.data, args.partitions)
+        with index:
+            # Output new rows
+            if args.source is None:
+                output_new_games(iter_entries(entries_text.strip().split('\n'), stats), index, args.append, stats)
+            elif args.cache:
+                salt = f"digest\0{roster_fingerprint(get_roster())}"
+                with open_binary(args.source) as f, ChunkCache.for_data(args.data, args.cache_mb, salt) as cache:
+                    output_new_games(iter_entries_cached(f, cache, stats), index, args.append, stats)
+            else:
+                with open_source(args.source) as f:
+                    output_new_games(iter_entries(f, stats), index, args.append, stats)
+    ingest_stats.finish(stats, args)
+
+if __name__ == '__main__':
+    main()
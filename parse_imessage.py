@@ -1,127 +1,300 @@
 #!/usr/bin/env python3
-import re
-import sys
-
-# Read existing entries to check duplicates
-existing = set()
-try:
-    with open('data.csv', 'r') as f:
-        for line in f:
-            if ',' in line and not line.startswith('user'):
-                parts = line.strip().split(',')
-                if len(parts) >= 2:
-                    existing.add((parts[0].strip().lower(), parts[1].strip()))
-except:
-    pass
-
-# iMessage text (provided by user)
-imessage_text = """[The full iMessage text would go here - I'll parse it programmatically]"""
-
-# Read from stdin or file
-if len(sys.argv) > 1:
-    with open(sys.argv[1], 'r') as f:
-        imessage_text = f.read()
-else:
-    # For now, we'll parse the provided text
-    pass
-
-# Month mapping
-month_map = {
-    'january': '01', 'jan': '01',
-    'february': '02', 'feb': '02',
-    'march': '03', 'mar': '03',
-    'april': '04', 'apr': '04',
-    'may': '05',
-    'june': '06', 'jun': '06',
-    'july': '07', 'jul': '07',
-    'august': '08', 'aug': '08',
-    'september': '09', 'sep': '09', 'sept': '09',
-    'october': '10', 'oct': '10',
-    'november': '11', 'nov': '11',
-    'december': '12', 'dec': '12'
-}
-
-def parse_imessage_data(text):
-    """Parse iMessage data and extract MapTap scores"""
-    new_rows = []
-    
-    # Split by lines and process
-    lines = text.split('\n')
-    current_user = None
-    current_date = None
-    
-    i = 0
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        # Skip empty lines
-        if not line:
-            i += 1
-            continue
-        
-        # Check for user name (before MapTap line)
-        # User names appear as: "Stephen Alexander", "Ellie Alexander", etc.
-        # Skip if it's Abigail or Joshua
-        if 'abigail jenquist' in line.lower() or 'joshua jenquist' in line.lower():
-            # Skip this user's entries
-            i += 1
-            # Skip until next user or MapTap line
-            while i < len(lines) and 'maptap' not in lines[i].lower():
-                i += 1
-            continue
-        
-        # Check if this line contains a user name
-        user_match = re.search(r'(Stephen Alexander|Ellie Alexander|David Ellis|Ashley Ellis|scott caskey)', line, re.IGNORECASE)
-        if user_match:
-            current_user = user_match.group(1).strip()
-            i += 1
-            continue
-        
-        # Look for MapTap date line: "www.MapTap.gg October 23" or "MapTap October 30"
-        maptap_match = re.search(r'maptap.*?(october|november|december|oct|nov|dec)\s+(\d+)', line, re.IGNORECASE)
-        if maptap_match:
-            month_str = maptap_match.group(1).lower()
-            day = maptap_match.group(2)
-            month = month_map.get(month_str, '12')
-            current_date = f"2025-{month}-{day.zfill(2)}"
-            i += 1
-            continue
-        
-        # Look for score line: "97! 94" 81# 65$ 35%" or similar
-        # Pattern: number followed by emoji/symbol, repeated 5 times
-        score_match = re.match(r'^(\d+[^\d\s]{0,3})\s+(\d+[^\d\s]{0,3})\s+(\d+[^\d\s]{0,3})\s+(\d+[^\d\s]{0,3})\s+(\d+[^\d\s]{0,3})', line)
-        if score_match and current_user and current_date:
-            scores = []
-            for j in range(1, 6):
-                score_str = score_match.group(j)
-                # Extract number and emoji
-                num_match = re.match(r'(\d+)(.*)', score_str)
-                if num_match:
-                    score = num_match.group(1)
-                    emoji = num_match.group(2) if num_match.group(2) else ''
-                    scores.append((score, emoji))
-            
+import argparse
+import io
+import json
+import os
+import pickle
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import ingest_stats
+from chunk_cache import BLANK_LINE, CACHE_MB, ChunkCache, iter_chunks, open_binary, roster_fingerprint
+from datafile import DATA_CSV, game_rows, open_source
+from dedup_index import iter_new_games, output_new_games
+from partitions import add_partitions_argument, open_index
+from records import BATCH_GAMES, iter_batches
+from roster import add_roster_argument, load_roster
+from tokenizer import DATE, IGNORED, SCORE, SKIP, USER, classify_line, get_roster, set_roster
+
+
+# Bytes per chunk handed to a worker by iter_games_parallel()
+CHUNK_BYTES = 1 << 20
+
+
+class IMessageParser:
+    """Line-at-a-time MapTap parser.
+
+    Holds only the state needed between lines: the pending user and date,
+    whether a skipped player's block is being passed over, and a score line
+    still waiting for its "Final score" on the next line.
+    """
+
+    def __init__(self):
+        self.current_user = None
+        self.current_date = None
+        self.skipping = False
+        self.pending = None
+
+    def get_state(self):
+        """The parser state as JSON-serializable values"""
+        return {
+            'current_user': self.current_user,
+            'current_date': self.current_date,
+            'skipping': self.skipping,
+            'pending': self.pending,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        """A parser resuming from a get_state() result"""
+        parser = cls()
+        parser.current_user = state['current_user']
+        parser.current_date = state['current_date']
+        parser.skipping = state['skipping']
+        if state['pending'] is not None:
+            user, date, scores = state['pending']
+            parser.pending = (user, date, tuple(tuple(pair) for pair in scores))
+        return parser
+
+    def feed(self, raw):
+        """Process one line, returning a completed (user, date, scores, final) game or None"""
+        return self.apply(classify_line(raw))
+
+    def apply(self, event):
+        """Advance the state by one classified line"""
+        final, maptap, kind, value = event
+        game = None
+
+        # A score line without a final score looks ahead at this line
+        if self.pending is not None:
+            user, date, scores = self.pending
+            self.pending = None
+            if final is not None:
+                game = (user, date, scores, final)
+                self.current_user = None
+                self.current_date = None
+
+        # Skip a skipped player's lines until the next MapTap line
+        if self.skipping:
+            if not maptap:
+                return game
+            self.skipping = False
+
+        if kind == SKIP:
+            self.skipping = True
+        elif kind == USER:
+            self.current_user = value
+        elif kind == DATE:
+            self.current_date = value
+        elif kind == SCORE and self.current_user and self.current_date and len(value) == 5:
             # Look for final score on same or next line
-            final_match = re.search(r'final\s+score:\s*(\d+)', line, re.IGNORECASE)
-            if not final_match and i + 1 < len(lines):
-                final_match = re.search(r'final\s+score:\s*(\d+)', lines[i + 1], re.IGNORECASE)
-            
-            if final_match and len(scores) == 5:
-                final_score = final_match.group(1)
-                user_key = current_user.lower()
-                
-                # Skip if duplicate
-                if (user_key, current_date) not in existing:
-                    for loc_num, (score, emoji) in enumerate(scores, 1):
-                        new_rows.append(f"{current_user},{current_date},{loc_num},{score},{emoji},{final_score}")
-                
+            if final is not None:
+                game = (self.current_user, self.current_date, value, final)
                 # Reset for next entry
-                current_user = None
-                current_date = None
-        
-        i += 1
-    
-    return new_rows
+                self.current_user = None
+                self.current_date = None
+            else:
+                self.pending = (self.current_user, self.current_date, value)
+
+        return game
+
+
+def count_line(event, stats):
+    """Count one classified line by kind"""
+    final, maptap, kind, _ = event
+    if event is IGNORED:
+        stats.count('lines.ignored')
+    else:
+        stats.count(f"lines.{kind or ('final' if final is not None else 'maptap')}")
+    if final is not None:
+        stats.count('final_scores')
+
+
+def apply_counted(parser, event, stats):
+    """parser.apply(event), counting games and the lines that lead nowhere"""
+    final, maptap, kind, _ = event
+    resolves = parser.pending is not None and final is not None
+    if parser.pending is not None and final is None:
+        stats.count('rejected.missing_final_score')
+    if parser.skipping and not maptap:
+        stats.count('rejected.excluded_player_line')
+    elif kind == SCORE and (resolves or not (parser.current_user and parser.current_date)):
+        stats.count('rejected.score_without_user_or_date')
+    game = parser.apply(event)
+    if game is not None:
+        stats.count('games_parsed')
+    return game
+
+
+def iter_games(lines, stats=None):
+    """Yield each (user, date, scores, final) game as soon as it completes"""
+    if stats is not None:
+        yield from _iter_games_counted(lines, stats)
+        return
+    parser = IMessageParser()
+    apply = parser.apply
+    for line in lines:
+        event = classify_line(line)
+        # An ignored line only matters when it ends a pending lookahead
+        if event is IGNORED and parser.pending is None:
+            continue
+        game = apply(event)
+        if game is not None:
+            yield game
+
+
+def _iter_games_counted(lines, stats, parser=None):
+    """iter_games() with every line counted into stats"""
+    if parser is None:
+        parser = IMessageParser()
+    for line in lines:
+        stats.count('lines_read')
+        event = classify_line(line)
+        count_line(event, stats)
+        if event is IGNORED and parser.pending is None:
+            continue
+        game = apply_counted(parser, event, stats)
+        if game is not None:
+            yield game
+
+
+def chunk_ranges(path, chunk_bytes=CHUNK_BYTES):
+    """Yield (path, start, end) byte ranges of about chunk_bytes that each end on a line boundary"""
+    size = os.path.getsize(path)
+    start = 0
+    with open(path, 'rb') as f:
+        while start < size:
+            end = start + chunk_bytes
+            if end < size:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            end = min(end, size)
+            yield path, start, end
+            start = end
+
+
+def chunk_lines(data):
+    """Lines of a line-aligned chunk of the file's bytes"""
+    # StringIO applies the same newline translation as reading the file directly
+    return io.StringIO(data.decode('utf-8'), newline=None)
+
+
+def classify_chunk(chunk):
+    """Classify the lines of one byte range; returns (line count, [(line number, event)]), pickled.
+
+    The parent keeps finished chunks pickled until their turn comes, since
+    the unpickled events take about ten times the chunk's size.
+    """
+    path, start, end = chunk
+    with open(path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    events = []
+    count = 0
+    for count, line in enumerate(chunk_lines(data), 1):
+        event = classify_line(line)
+        if event is not IGNORED:
+            events.append((count - 1, event))
+    return pickle.dumps((count, events), pickle.HIGHEST_PROTOCOL)
+
+
+def iter_classified(path, jobs, chunk_bytes=CHUNK_BYTES):
+    """classify_chunk() results in file order, with at most jobs * 2 chunks in flight"""
+    # Workers may be spawned rather than forked, so they get the roster explicitly
+    with ProcessPoolExecutor(jobs, initializer=set_roster, initargs=(get_roster(),)) as pool:
+        pending = deque()
+        for chunk in chunk_ranges(path, chunk_bytes):
+            if len(pending) >= jobs * 2:
+                yield pickle.loads(pending.popleft().result())
+            pending.append(pool.submit(classify_chunk, chunk))
+        while pending:
+            yield pickle.loads(pending.popleft().result())
+
+
+def iter_games_parallel(path, jobs, stats=None, chunk_bytes=CHUNK_BYTES):
+    """Parse a file on several cores, yielding exactly the games iter_games() would.
+
+    Workers do the per-line regex work on line-aligned chunks of about
+    chunk_bytes; the cheap state transitions then run in file order here, so
+    a game whose user, date, score and final score lines straddle a chunk
+    edge is still assembled. Only a few chunks per worker are read ahead, so
+    memory stays bounded however large the file is.
+    """
+    parser = IMessageParser()
+    if stats is None:
+        apply = parser.apply
+    else:
+        def apply(event):
+            return apply_counted(parser, event, stats)
+    for count, events in iter_classified(path, jobs, chunk_bytes):
+        if stats is not None:
+            stats.count('lines_read', count)
+            stats.count('lines.ignored', count - len(events))
+            for _, event in events:
+                count_line(event, stats)
+        last = -1
+        for line_no, event in events:
+            # Ignored lines between events still end a pending lookahead
+            if line_no != last + 1 and parser.pending is not None:
+                apply(IGNORED)
+            game = apply(event)
+            if game is not None:
+                yield game
+            last = line_no
+        if last != count - 1 and parser.pending is not None:
+            apply(IGNORED)
+
+
+def iter_games_cached(f, cache, stats=None):
+    """iter_games() over a binary file, parsing only the chunks the cache hasn't seen.
+
+    A chunk's entry is keyed by its bytes and the parser state it starts in,
+    and holds the games it completes, the state it leaves behind and its
+    counters, so a game straddling a chunk edge comes out as it would
+    without the cache. Chunk edges fall on blank lines between messages,
+    where the state is usually the same from one export to the next.
+    """
+    parser = IMessageParser()
+    for data in iter_chunks(f, BLANK_LINE):
+        state = json.dumps(parser.get_state(), ensure_ascii=False).encode('utf-8')
+        key = cache.key(state + b'\0' + data)
+        value = cache.get(key)
+        if value is None:
+            # Counted whether or not this run wants stats, so a later run
+            # reports the same counters from the cache
+            counted = ingest_stats.IngestStats()
+            games = list(_iter_games_counted(chunk_lines(data), counted, parser))
+            counters = counted.counters
+            cache.put(key, {'games': games, 'state': parser.get_state(), 'counters': counters})
+        else:
+            games = [(user, date, tuple(tuple(pair) for pair in scores), final)
+                     for user, date, scores, final in value['games']]
+            parser = IMessageParser.from_state(value['state'])
+            counters = value['counters']
+        if stats is not None:
+            for name, n in counters.items():
+                stats.count(name, n)
+        yield from games
+    if stats is not None:
+        stats.count('cache.hits', cache.hits)
+        stats.count('cache.misses', cache.misses)
+
+
+def iter_game_batches(lines, size=BATCH_GAMES, stats=None):
+    """iter_games() grouped into compact GameBatches of up to size games"""
+    return iter_batches(iter_games(lines, stats), size)
+
+
+def iter_new_rows(lines, index):
+    """Yield CSV rows for every parsed game not already in the dedup index"""
+    for game in iter_new_games(iter_games(lines), index):
+        yield from game_rows(game)
+
+
+def parse_imessage_data(text, index=frozenset()):
+    """Parse iMessage data and extract MapTap scores"""
+    return list(iter_new_rows(text.split('\n'), index))
 
 # For now, let's manually parse the provided data since it's complex
 # I'll create entries based on the patterns I see
@@ -309,15 +482,44 @@ manual_entries.append(("Ellie Alexander", "2025-12-01", [("99", "&"), ("96", "!"
 manual_entries.append(("Ellie Alexander", "2025-12-02", [("94", '"'), ("921", ""), ("86", "("), ("83", "+"), ("90", "'")], "877"))
 manual_entries.append(("Stephen Alexander", "2025-12-02", [("94", '"'), ("97", "!"), ("99", "&"), ("74", "."), ("440", "")], "743"))
 
-# Generate CSV rows
-new_rows = []
-for user, date, scores, final_score in manual_entries:
-    user_key = user.lower()
-    if (user_key, date) not in existing:
-        for loc_num, (score, emoji) in enumerate(scores, 1):
-            new_rows.append(f"{user},{date},{loc_num},{score},{emoji},{final_score}")
-
-# Output new rows
-for row in new_rows:
-    print(row)
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Extract MapTap scores from an iMessage export')
+    parser.add_argument('source', nargs='?',
+                        help="export file to stream, or '-' for stdin (default: built-in manual entries)")
+    parser.add_argument('--data', default=DATA_CSV, help='existing data file used for duplicate checks')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='worker processes for parsing an export file (default: 1, sequential)')
+    parser.add_argument('--append', action='store_true',
+                        help='merge new games into the data file instead of printing rows')
+    add_partitions_argument(parser)
+    add_roster_argument(parser)
+    parser.add_argument('--cache', action='store_true',
+                        help='reuse parse results for chunks of the export seen in earlier runs (overrides --jobs)')
+    parser.add_argument('--cache-mb', type=int, default=CACHE_MB,
+                        help=f'size limit of the chunk cache in MB (default: {CACHE_MB})')
+    ingest_stats.add_arguments(parser)
+    args = parser.parse_args(argv)
+    set_roster(load_roster(args.roster))
+    stats = ingest_stats.from_args(args)
+
+    with ingest_stats.profiled(args.profile):
+        with ingest_stats.stage(stats, 'index'):
+            index = open_index(args.data, args.partitions)
+        with index:
+            # Output new rows
+            if args.source is None:
+                output_new_games(manual_entries, index, args.append, stats)
+            elif args.cache:
+                salt = f"imessage\0{roster_fingerprint(get_roster())}"
+                with open_binary(args.source) as f, ChunkCache.for_data(args.data, args.cache_mb, salt) as cache:
+                    output_new_games(iter_games_cached(f, cache, stats), index, args.append, stats)
+            elif args.jobs > 1 and args.source != '-':
+                output_new_games(iter_games_parallel(args.source, args.jobs, stats), index, args.append, stats)
+            else:
+                with open_source(args.source) as f:
+                    output_new_games(iter_games(f, stats), index, args.append, stats)
+    ingest_stats.finish(stats, args)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""Month-partitioned game storage.
+
+Instead of one data.csv holding all of history, games can be kept in one
+CSV per month (2025-10.csv, ...) in a partition directory, each sorted like
+data.csv, plus a manifest.json with every partition's row and game counts
+and its first and last date. An ingest only reads and rewrites the
+partitions its games' dates fall in, so adding a day touches one small file.
+Exports read only the partitions that overlap the requested dates and merge
+them back into a single data.csv in the same order it would have had.
+
+    python3 partitions.py split data.csv partitions
+    python3 parse_imessage.py export.txt --partitions partitions --append
+    python3 partitions.py export partitions data.csv
+"""
+import argparse
+import contextlib
+import heapq
+import json
+import os
+import re
+from operator import itemgetter
+
+from append_hook import AppendHook
+from datafile import (HEADER, Unsorted, atomic_write, check_sorted, file_state, iter_csv_blocks, iter_csv_games,
+                      iter_game_keys, locked, merge_games, open_at, state_path)
+from dedup_index import DedupIndex, iter_new_games
+
+MANIFEST = 'manifest.json'
+MANIFEST_VERSION = 1
+MONTH_RE = re.compile(r'(\d{4}-\d{2})-')
+# Partition for games whose date isn't YYYY-MM-DD
+OTHER = 'other'
+
+
+def month_of(date):
+    match = MONTH_RE.match(date)
+    return match.group(1) if match else OTHER
+
+
+def iter_partition_blocks(f):
+    """Game blocks of an open partition or data file, skipping its header"""
+    return iter_csv_blocks(line for line in f if not line.startswith('user,'))
+
+
+def sort_partition(path):
+    """Sort a partition file in place unless it already is"""
+    with open_at(path) as f:
+        try:
+            for _ in check_sorted(iter_partition_blocks(f)):
+                pass
+            return
+        except Unsorted:
+            f.seek(0)
+            blocks = sorted(iter_partition_blocks(f), key=itemgetter(0))
+    with atomic_write(path) as out:
+        out.write(HEADER + '\n')
+        for _, lines in blocks:
+            out.writelines(lines)
+
+
+def partition_stats(path):
+    """Row and game counts and the date range of one partition file"""
+    rows = games = 0
+    dates = []
+    with open_at(path) as f:
+        for (_, date), lines in iter_partition_blocks(f):
+            rows += len(lines)
+            games += 1
+            dates.append(date)
+    return {'rows': rows, 'games': games, 'minDate': min(dates, default=None), 'maxDate': max(dates, default=None)}
+
+
+class PartitionStore:
+    """A directory of month partitions; usable wherever a DedupIndex is"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        # Where appended games go, as reported by output_new_games()
+        self.data_path = directory
+        self.manifest_path = os.path.join(directory, MANIFEST)
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = self._load_manifest()
+        # month -> keys of the games in that partition, read on first use
+        self.keys = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == MANIFEST_VERSION:
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {'version': MANIFEST_VERSION, 'partitions': {}}
+
+    def _save_manifest(self):
+        self.manifest['partitions'] = dict(sorted(self.manifest['partitions'].items()))
+        with atomic_write(self.manifest_path) as out:
+            json.dump(self.manifest, out, indent=2)
+            out.write('\n')
+
+    def path(self, month):
+        return os.path.join(self.directory, f"{month}.csv")
+
+    def __contains__(self, key):
+        month = month_of(key.rsplit('|', 3)[1].strip())
+        if month not in self.keys:
+            path = self.path(month)
+            self.keys[month] = set(iter_game_keys(path)) if os.path.exists(path) else set()
+        return key in self.keys[month]
+
+    def known(self, keys):
+        """The subset of keys already stored"""
+        return {key for key in keys if key in self}
+
+    def sync(self):
+        """Pick up changes made by other processes"""
+        self.manifest = self._load_manifest()
+        self.keys = {}
+
+    def append(self, games):
+        """Merge the games not yet stored into their month partitions under the lock; returns them.
+
+        The streaks and snapshots are kept current by an AppendHook, as for
+        data.csv.
+        """
+        with locked(self.manifest_path):
+            self.sync()
+            new = list(iter_new_games(games, self))
+            hook = AppendHook(self)
+            by_month = {}
+            for game in new:
+                by_month.setdefault(month_of(game[1].strip()), []).append(game)
+            for month, month_games in by_month.items():
+                path = self.path(month)
+                merge_games(path, month_games)
+                self.manifest['partitions'][month] = dict(file=os.path.basename(path), **partition_stats(path))
+            if by_month:
+                self._save_manifest()
+            hook.merged(new)
+        return new
+
+    # As a source of games for the derived state (see datafile.DataFile),
+    # with the manifest standing in for data.csv: any change to it made
+    # outside append() means reading everything again
+
+    def state_path(self, name):
+        return state_path(self.manifest_path, name)
+
+    def state(self):
+        return file_state(self.manifest_path)
+
+    def changed_since(self, seen):
+        return None if seen and seen == self.state() else 0
+
+    def iter_games(self, offset=0):
+        """Every game, in data.csv order"""
+        return iter_csv_games(self.iter_lines())
+
+    def months(self, start=None, end=None):
+        """Partitions with games dated start..end inclusive, going by the manifest"""
+        months = []
+        for month, info in self.manifest['partitions'].items():
+            if info['games'] == 0:
+                continue
+            if start and info['maxDate'] < start or end and info['minDate'] > end:
+                continue
+            months.append(month)
+        return months
+
+    def iter_lines(self, start=None, end=None):
+        """data.csv lines (without header) of the games dated start..end, in data.csv order"""
+        with contextlib.ExitStack() as stack:
+            sources = []
+            for month in self.months(start, end):
+                f = stack.enter_context(open_at(self.path(month)))
+                sources.append(iter_partition_blocks(f))
+            for (_, date), lines in heapq.merge(*sources, key=itemgetter(0)):
+                if (not start or date >= start) and (not end or date <= end):
+                    yield from lines
+
+    def export(self, data_path, start=None, end=None):
+        """Write the games dated start..end to data_path as one CSV; returns the row count"""
+        count = 0
+        with atomic_write(data_path) as out:
+            out.write(HEADER + '\n')
+            for line in self.iter_lines(start, end):
+                out.write(line if line.endswith('\n') else line + '\n')
+                count += 1
+        return count
+
+    @classmethod
+    def split(cls, data_path, directory):
+        """Partition an existing data file; existing partitions in directory are replaced"""
+        store = cls(directory)
+        with locked(store.manifest_path):
+            files = {}
+            try:
+                with open_at(data_path) as f:
+                    for (_, date), lines in iter_partition_blocks(f):
+                        month = month_of(date)
+                        if month not in files:
+                            files[month] = open(f"{store.path(month)}.split", 'w', encoding='utf-8', newline='')
+                            files[month].write(HEADER + '\n')
+                        files[month].writelines(line if line.endswith('\n') else line + '\n' for line in lines)
+            finally:
+                for out in files.values():
+                    out.close()
+            store.manifest['partitions'] = {}
+            for month in files:
+                path = store.path(month)
+                os.replace(f"{path}.split", path)
+                sort_partition(path)
+                store.manifest['partitions'][month] = dict(file=os.path.basename(path), **partition_stats(path))
+            for name in os.listdir(directory):
+                if name.endswith('.csv') and name[:-4] not in files:
+                    os.remove(os.path.join(directory, name))
+            store._save_manifest()
+        return store
+
+
+def add_partitions_argument(parser):
+    """Add the --partitions option to an ingest's argument parser; pass its value to open_index()"""
+    parser.add_argument('--partitions',
+                        help='month partition directory to check against and append to instead of the data file')
+
+
+def open_index(data_path, partitions=None):
+    """The duplicate index for an ingest: a partition store if partitions is given, else data_path's"""
+    if partitions:
+        return PartitionStore(partitions)
+    return DedupIndex(data_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Split game data into month partitions and export it back')
+    sub = parser.add_subparsers(dest='command', required=True)
+    split = sub.add_parser('split', help='partition a data file')
+    split.add_argument('data', help='data file to split, e.g. data.csv')
+    split.add_argument('directory')
+    export = sub.add_parser('export', help='rebuild a single data file from the partitions')
+    export.add_argument('directory')
+    export.add_argument('data', help='data file to write, e.g. data.csv')
+    export.add_argument('--start', help='first date to export (YYYY-MM-DD)')
+    export.add_argument('--end', help='last date to export (YYYY-MM-DD)')
+    info = sub.add_parser('info', help='list the partitions from the manifest')
+    info.add_argument('directory')
+    args = parser.parse_args(argv)
+
+    if args.command == 'split':
+        store = PartitionStore.split(args.data, args.directory)
+        print(f"Split {args.data} into {len(store.manifest['partitions'])} partitions in {args.directory}")
+    elif args.command == 'export':
+        store = PartitionStore(args.directory)
+        count = store.export(args.data, args.start, args.end)
+        print(f"Exported {count} rows from {len(store.months(args.start, args.end))} partitions to {args.data}")
+    else:
+        store = PartitionStore(args.directory)
+        for month, info in store.manifest['partitions'].items():
+            print(f"{month}: {info['games']} games, {info['rows']} rows, {info['minDate']} to {info['maxDate']}")
+
+
+if __name__ == '__main__':
+    main()
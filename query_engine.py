@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""Indexed in-memory queries over the game history, served like server.js.
+
+data.csv is read once into one record per player and date (as server.js
+groups it) and indexed: each player's records sorted by date with prefix
+sums of total and perfect scores, and all records sorted by date with
+per-date offsets. Date ranges become two bisections, and a range's totals
+and averages come straight from the prefix sums without touching the
+records in between; responses that list records cost only their own size.
+
+The /api/players, /api/dates, /api/data, /api/leaderboard, /api/trends,
+/api/player/:player, /api/compare and /api/aggregations endpoints answer
+with the same JSON as server.js, from the same rows (see iter_rows()), and
+/api/summary gives per-player totals for any date range. The data file is
+re-indexed when it changes.
+"""
+import argparse
+import bisect
+import json
+import re
+import threading
+from http import HTTPStatus
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from itertools import accumulate
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from build_snapshots import period_key
+from datafile import DATA_CSV, changed_since, file_state
+from streaks import js_round, rolling_averages
+
+INT_RE = re.compile(r'\s*([+-]?\d+)')
+
+
+def js_int(value):
+    """parseInt(): the leading integer of a string, or None"""
+    if value.isdigit():
+        return int(value)
+    match = INT_RE.match(value)
+    return int(match.group(1)) if match else None
+
+
+def js_keys(counts):
+    """Reorder a dict the way a JS object orders its keys: integer keys first, ascending"""
+    numeric = sorted((int(key), key) for key in counts
+                     if key.isdigit() and key.isascii() and str(int(key)) == key and int(key) < 2**32 - 1)
+    if not numeric:
+        return dict(counts)
+    ordered = {key: counts[key] for _, key in numeric}
+    ordered.update((key, value) for key, value in counts.items() if key not in ordered)
+    return ordered
+
+
+def iter_rows(path):
+    """Yield the data.csv rows server.js keeps: (user, date, location, score, emoji, total).
+
+    Lines are split on every comma, as csv-parser does, with the first line
+    as the header. A row whose emoji is itself a comma has an empty
+    total_score column and its total in a seventh one, so server.js drops it,
+    and so does this.
+    """
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        header = True
+        for line in f:
+            line = line.rstrip('\r\n')
+            if not line:
+                continue
+            if header:
+                header = False
+                continue
+            fields = line.split(',')
+            if len(fields) < 6:
+                continue
+            user, date, loc_num, score, emoji, total = fields[:6]
+            if not (user and date and loc_num and score and total):
+                continue
+            loc, value, total = js_int(loc_num), js_int(score), js_int(total)
+            if loc is None or value is None or total is None:
+                continue
+            yield user.lower().strip(), date, loc, value, emoji, total
+
+
+class UserIndex:
+    """One player's records sorted by date, with prefix sums"""
+
+    def __init__(self, records):
+        self.records = sorted(records, key=lambda r: r['date'])
+        self.dates = [r['date'] for r in self.records]
+        self.total_prefix = [0, *accumulate(r['totalScore'] for r in self.records)]
+        self.perfect_prefix = [0, *accumulate(r['perfectScores'] for r in self.records)]
+        # Whole-history figures that don't come from prefix sums
+        self.seen_order = sorted(records, key=lambda r: r['seq'])
+        self.lowest = min(r['lowestScore'] for r in self.records)
+        self.highest = max(r['highestScore'] for r in self.records)
+        self.emoji_counts = {}
+        for record in self.seen_order:
+            for emoji, count in record['emojiCounts'].items():
+                self.emoji_counts[emoji] = self.emoji_counts.get(emoji, 0) + count
+        stats = {}
+        for record in self.records:
+            for loc, score in record['locations']:
+                entry = stats.setdefault(loc, {'location': loc, 'totalScore': 0, 'attempts': 0,
+                                               'avgScore': 0, 'minScore': score, 'maxScore': 0})
+                entry['totalScore'] += score
+                entry['attempts'] += 1
+                entry['minScore'] = min(entry['minScore'], score)
+                entry['maxScore'] = max(entry['maxScore'], score)
+        # Numeric keys iterate in ascending order in JS objects
+        self.location_stats = [stats[loc] for loc in sorted(stats)]
+        for entry in self.location_stats:
+            entry['avgScore'] = js_round(entry['totalScore'] / entry['attempts'])
+
+    def span(self, start=None, end=None):
+        """Index range of the records dated start..end inclusive"""
+        lo = bisect.bisect_left(self.dates, start) if start else 0
+        hi = bisect.bisect_right(self.dates, end) if end else len(self.dates)
+        return lo, max(lo, hi)
+
+    def summary(self, start=None, end=None):
+        lo, hi = self.span(start, end)
+        games = hi - lo
+        total = self.total_prefix[hi] - self.total_prefix[lo]
+        return {
+            'gamesPlayed': games,
+            'totalScore': total,
+            'avgScore': js_round(total / games) if games else 0,
+            'perfectScores': self.perfect_prefix[hi] - self.perfect_prefix[lo],
+        }
+
+
+class GameIndex:
+    """Read-only indexes over one load of the data file"""
+
+    def __init__(self, rows):
+        # (user, date) -> record, in order of first appearance like server.js
+        records = {}
+        for user, date, loc, score, emoji, total in rows:
+            record = records.get((user, date))
+            if record is None:
+                record = records[(user, date)] = {
+                    'user': user, 'date': date, 'totalScore': total, 'perfectScores': 0,
+                    'lowestScore': score, 'highestScore': max(score, 0), 'emojiCounts': {},
+                    'locations': [], 'seq': len(records),
+                }
+            if score == 100:
+                record['perfectScores'] += 1
+            record['lowestScore'] = min(record['lowestScore'], score)
+            record['highestScore'] = max(record['highestScore'], score)
+            if emoji:
+                record['emojiCounts'][emoji] = record['emojiCounts'].get(emoji, 0) + 1
+            record['locations'].append((loc, score))
+
+        # Stable sort keeps first-appearance order within a date
+        self.records = sorted(records.values(), key=lambda r: r['date'])
+        self.record_dates = [r['date'] for r in self.records]
+        self.dates = sorted(set(self.record_dates))
+        by_user = {}
+        for record in records.values():
+            by_user.setdefault(record['user'], []).append(record)
+        # Players in order of first appearance, as server.js builds its objects
+        self.order = list(by_user)
+        self.users = {user: UserIndex(user_records) for user, user_records in by_user.items()}
+
+    def span(self, start=None, end=None):
+        lo = bisect.bisect_left(self.record_dates, start) if start else 0
+        hi = bisect.bisect_right(self.record_dates, end) if end else len(self.record_dates)
+        return lo, max(lo, hi)
+
+    def players(self):
+        return sorted(self.users)
+
+    def leaderboard(self, date=None):
+        if date:
+            lo, hi = self.span(date, date)
+            entries = [{
+                'user': r['user'], 'totalScore': r['totalScore'], 'gamesPlayed': 1, 'avgScore': r['totalScore'],
+                'perfectScores': r['perfectScores'], 'lowestScore': r['lowestScore'],
+                'emojiCounts': js_keys(r['emojiCounts']),
+            } for r in self.records[lo:hi]]
+        else:
+            entries = []
+            for user in self.order:
+                index = self.users[user]
+                summary = index.summary()
+                entries.append({
+                    'user': user, 'totalScore': summary['totalScore'], 'gamesPlayed': summary['gamesPlayed'],
+                    'avgScore': summary['avgScore'], 'perfectScores': summary['perfectScores'],
+                    'lowestScore': index.lowest, 'emojiCounts': js_keys(index.emoji_counts),
+                })
+        return sorted(entries, key=lambda e: -e['totalScore'])
+
+    @staticmethod
+    def _in_seen_order(records):
+        """Records in the order they first appear in the file, as server.js iterates them"""
+        return sorted(records, key=lambda r: r['seq'])
+
+    def trends(self, player=None, start=None, end=None):
+        if player:
+            index = self.users.get(player)
+            if index is None:
+                return []
+            lo, hi = index.span(start, end)
+            records = index.records[lo:hi]
+        else:
+            lo, hi = self.span(start, end)
+            records = self.records[lo:hi]
+        return [{'user': r['user'], 'date': r['date'], 'totalScore': r['totalScore'],
+                 'perfectScores': r['perfectScores']} for r in records]
+
+    def player(self, player):
+        index = self.users.get(player)
+        if index is None:
+            return None
+        summary = index.summary()
+        # Fresh copies, since the sort below must not reorder the index
+        location_list = [dict(stats) for stats in index.location_stats]
+        location_list.sort(key=lambda s: s['avgScore'])
+        return {
+            'user': player,
+            'totalGames': summary['gamesPlayed'],
+            'totalScore': summary['totalScore'],
+            'avgScore': summary['avgScore'],
+            'perfectScores': summary['perfectScores'],
+            'lowestScore': index.lowest,
+            'highestScore': index.highest,
+            'gamesByDate': {r['date']: {
+                'totalScore': r['totalScore'], 'perfectScores': r['perfectScores'],
+                'lowestScore': r['lowestScore'], 'highestScore': r['highestScore'],
+                'emojiCounts': js_keys(r['emojiCounts']),
+            } for r in index.seen_order},
+            'emojiCounts': js_keys(index.emoji_counts),
+            'locationStats': location_list,
+            'nemesisLocation': location_list[0]['location'] if location_list else None,
+        }
+
+    def compare(self, players):
+        comparison = []
+        for name in players:
+            index = self.users.get(name)
+            if index is None:
+                continue
+            summary = index.summary()
+            comparison.append({
+                'user': name,
+                'totalGames': summary['gamesPlayed'],
+                'totalScore': summary['totalScore'],
+                'avgScore': summary['avgScore'],
+                'perfectScores': summary['perfectScores'],
+                'lowestScore': index.lowest,
+                'highestScore': index.highest,
+                'trends': [{'date': r['date'], 'score': r['totalScore']} for r in index.records],
+                'gamesByDate': {r['date']: {
+                    'totalScore': r['totalScore'], 'perfectScores': r['perfectScores'],
+                    'lowestScore': r['lowestScore'], 'highestScore': r['highestScore'],
+                    'locationScores': [score for _, score in r['locations']],
+                } for r in index.seen_order},
+            })
+
+        head_to_head = None
+        if len(comparison) == 2:
+            p1, p2 = comparison
+            wins = {p1['user']: 0, p2['user']: 0}
+            ties = 0
+            common = [t['date'] for t in p1['trends'] if t['date'] in p2['gamesByDate']]
+            for date in common:
+                s1 = p1['gamesByDate'][date]['totalScore']
+                s2 = p2['gamesByDate'][date]['totalScore']
+                if s1 > s2:
+                    wins[p1['user']] += 1
+                elif s2 > s1:
+                    wins[p2['user']] += 1
+                else:
+                    ties += 1
+            head_to_head = {'commonGames': len(common), p1['user']: wins[p1['user']]}
+            head_to_head[p2['user']] = wins[p2['user']]
+            head_to_head['ties'] = ties
+        return {'players': comparison, 'headToHead': head_to_head}
+
+    def aggregations(self, period='day', start=None, end=None):
+        lo, hi = self.span(start, end)
+        records = self._in_seen_order(self.records[lo:hi])
+        buckets = {}
+        for r in records:
+            key = period_key(r['date'], period)
+            bucket = buckets.setdefault((key, r['user']), {
+                'period': key, 'user': r['user'], 'totalScore': 0, 'gamesPlayed': 0, 'dates': []})
+            bucket['totalScore'] += r['totalScore']
+            bucket['gamesPlayed'] += 1
+            bucket['dates'].append(r['date'])
+
+        rolling = {'sevenDay': [], 'thirtyDay': []}
+        if period == 'day':
+            daily = {}
+            for r in records:
+                day = daily.setdefault(r['date'], [0, 0])
+                day[0] += r['totalScore']
+                day[1] += 1
+            rolling = rolling_averages(daily)
+
+        return {
+            'period': period,
+            'aggregations': sorted(buckets.values(), key=lambda b: b['period']),
+            'rollingAverages': rolling,
+        }
+
+    def summary(self, start=None, end=None, players=None):
+        """Per-player totals over a date range, from prefix sums alone"""
+        names = players or self.order
+        result = []
+        for name in names:
+            index = self.users.get(name)
+            if index is not None:
+                result.append(dict({'user': name}, **index.summary(start, end)))
+        return sorted(result, key=lambda e: -e['totalScore'])
+
+
+class QueryEngine:
+    """Routes API paths to a GameIndex that is rebuilt when the data file changes"""
+
+    def __init__(self, data_path=DATA_CSV):
+        self.data_path = data_path
+        self.index = None
+        self.source = None
+        self.lock = threading.Lock()
+
+    def current(self):
+        with self.lock:
+            if self.index is None or changed_since(self.data_path, self.source) is not None:
+                self.source = file_state(self.data_path)
+                self.index = GameIndex(iter_rows(self.data_path) if self.source else ())
+            return self.index
+
+    def get(self, path, query=None):
+        """Answer an API path; returns (HTTP status, JSON payload), or None for unknown paths"""
+        query = query or {}
+        index = self.current()
+        parts = [unquote(part) for part in path.strip('/').split('/')]
+        if parts[:1] != ['api'] or len(parts) < 2:
+            return None
+        route = parts[1]
+        if route == 'data' and len(parts) == 2:
+            # The raw rows aren't indexed; this response is a full read either way
+            return HTTPStatus.OK, [{'user': user, 'date': date, 'location_number': loc, 'location_score': score,
+                                    'location_emoji': emoji, 'total_score': total}
+                                   for user, date, loc, score, emoji, total in iter_rows(self.data_path)]
+        if route == 'players':
+            return HTTPStatus.OK, index.players()
+        if route == 'dates':
+            return HTTPStatus.OK, index.dates
+        if route == 'leaderboard':
+            return HTTPStatus.OK, index.leaderboard(query.get('date'))
+        if route == 'trends':
+            return HTTPStatus.OK, index.trends(query.get('player'), query.get('startDate'), query.get('endDate'))
+        if route == 'player' and len(parts) == 3:
+            stats = index.player(parts[2])
+            if stats is None:
+                return HTTPStatus.NOT_FOUND, {'error': 'Player not found'}
+            return HTTPStatus.OK, stats
+        if route == 'compare':
+            if not query.get('players'):
+                return HTTPStatus.BAD_REQUEST, {'error': 'players parameter required'}
+            players = [p.strip().lower() for p in query['players'].split(',') if p.strip()]
+            if not 2 <= len(players) <= 3:
+                return HTTPStatus.BAD_REQUEST, {'error': 'Must compare 2-3 players'}
+            return HTTPStatus.OK, index.compare(players)
+        if route == 'aggregations':
+            return HTTPStatus.OK, index.aggregations(query.get('period', 'day'), query.get('startDate'),
+                                                     query.get('endDate'))
+        if route == 'summary':
+            players = [p.strip().lower() for p in query.get('players', '').split(',') if p.strip()]
+            return HTTPStatus.OK, index.summary(query.get('startDate'), query.get('endDate'), players)
+        return None
+
+
+def make_handler(engine, static_dir):
+    class Handler(SimpleHTTPRequestHandler):
+        """API requests go to the engine, anything else is a static file"""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=static_dir, **kwargs)
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if not url.path.startswith('/api/'):
+                return super().do_GET()
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            result = engine.get(url.path, query)
+            if result is None:
+                result = HTTPStatus.NOT_FOUND, {'error': 'Not found'}
+            status, payload = result
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Indexed queries over the game history')
+    parser.add_argument('--data', default=DATA_CSV, help='game data file')
+    sub = parser.add_subparsers(dest='command', required=True)
+    serve = sub.add_parser('serve', help='serve the API and the dashboard over HTTP')
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=3001)
+    serve.add_argument('--static', default='public', help='directory of static files to serve')
+    get = sub.add_parser('get', help='print one API response, e.g. get "/api/leaderboard?date=2025-10-23"')
+    get.add_argument('path')
+    args = parser.parse_args(argv)
+
+    engine = QueryEngine(args.data)
+    if args.command == 'get':
+        url = urlsplit(args.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        result = engine.get(url.path, query)
+        if result is None:
+            parser.error(f"unknown API path {url.path}")
+        status, payload = result
+        print(json.dumps(payload, ensure_ascii=False, indent=2))
+        if status != HTTPStatus.OK:
+            raise SystemExit(1)
+        return
+
+    engine.current()
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(engine, args.static))
+    print(f"Serving {args.data} on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""Compact batches of parsed games.
+
+The parsers produce each game as a tuple of strings, (user, date, [(score,
+emoji), ...], total): a tuple, a list or tuple of five pairs and a dozen
+strings per game. A GameBatch holds many games in the column layout of the
+game store instead: integer scores and totals in typed arrays, and users,
+dates and emojis as ids into dictionaries shared by every batch of a run.
+The parsers still build each game's tuple, and iter_batches() encodes it
+straight away, so only one game at a time exists in that form. A batch
+that is kept or sent between processes takes about 34 bytes per game and
+pickles to a few arrays.
+
+Dedup, validation and writers can work on the columns directly: keys() and
+iter_rows() build game keys and CSV rows from the ids, to_numpy() gives the
+same arrays as GameStore.to_numpy(), and validate.validate() takes a batch
+as it takes a store.
+
+A game whose text wouldn't survive the encoding (a score like "05",
+numbers too large for the columns, or more than five locations) is kept as
+its original tuple, so decoding a batch always gives back exactly the games
+that went in.
+"""
+import datetime
+import re
+from array import array
+
+from datafile import game_key, game_rows, key_score
+from game_store import COLUMNS, LOCATIONS, Encoder, columns_to_numpy
+
+BATCH_GAMES = 4096
+_PADDING = [0] * LOCATIONS
+
+
+# Numbers that int() reads back to the same text and that fit the score
+# ('h') and total ('i') columns
+_score_text = re.compile(r'(?:0|[1-9][0-9]{0,3})\Z').match
+_total_text = re.compile(r'(?:0|[1-9][0-9]{0,8})\Z').match
+
+
+def _encodable(game):
+    """Whether the columns reproduce game exactly"""
+    _, _, scores, total = game
+    try:
+        return (1 <= len(scores) <= LOCATIONS and _total_text(total) is not None and
+                all(_score_text(score) for score, _ in scores))
+    except TypeError:
+        return False
+
+
+class GameBatch:
+    """Parsed games in typed columns, decoding back to (user, date, scores, total) tuples"""
+
+    def __init__(self, users=None, dates=None, emojis=None):
+        # Dictionaries can be shared between batches so ids agree across a run
+        self._users = users if users is not None else Encoder()
+        self._dates = dates if dates is not None else Encoder()
+        self._emojis = emojis if emojis is not None else Encoder([''])
+        self.columns = {name: array(code) for name, code, _ in COLUMNS}
+        # position -> original game, for games the columns can't reproduce;
+        # their column entries are zeros with no locations
+        self.odd = {}
+
+    @classmethod
+    def like(cls, batch):
+        """An empty batch sharing another batch's dictionaries"""
+        return cls(batch._users, batch._dates, batch._emojis)
+
+    @classmethod
+    def from_games(cls, games):
+        batch = cls()
+        batch.extend(games)
+        return batch
+
+    @property
+    def users(self):
+        return self._users.values
+
+    @property
+    def dates(self):
+        return self._dates.values
+
+    @property
+    def emojis(self):
+        return self._emojis.values
+
+    def __len__(self):
+        return len(self.columns['user'])
+
+    def append(self, game):
+        cols = self.columns
+        if not _encodable(game):
+            self.odd[len(self)] = game
+            cols['user'].append(0)
+            cols['date'].append(0)
+            cols['total'].append(0)
+            cols['nloc'].append(0)
+            cols['scores'].extend(_PADDING)
+            cols['emojis'].extend(_PADDING)
+            return
+        user, date, scores, total = game
+        cols['user'].append(self._users.encode(user))
+        cols['date'].append(self._dates.encode(date))
+        cols['total'].append(int(total))
+        cols['nloc'].append(len(scores))
+        padding = _PADDING[len(scores):]
+        cols['scores'].extend([int(score) for score, _ in scores] + padding)
+        cols['emojis'].extend([self._emojis.encode(emoji) for _, emoji in scores] + padding)
+
+    def extend(self, games):
+        for game in games:
+            self.append(game)
+
+    def game(self, i):
+        """Decode the game at position i"""
+        odd = self.odd.get(i)
+        if odd is not None:
+            return odd
+        cols = self.columns
+        base = i * LOCATIONS
+        emojis = self.emojis
+        scores = [(str(cols['scores'][base + k]), emojis[cols['emojis'][base + k]])
+                  for k in range(cols['nloc'][i])]
+        return (self.users[cols['user'][i]], self.dates[cols['date'][i]], scores, str(cols['total'][i]))
+
+    def __iter__(self):
+        cols = self.columns
+        users, dates, emojis, odd = self.users, self.dates, self.emojis, self.odd
+        user, date, total, nloc, scores, emoji = (cols['user'], cols['date'], cols['total'], cols['nloc'],
+                                                  cols['scores'], cols['emojis'])
+        for i in range(len(self)):
+            if odd and i in odd:
+                yield odd[i]
+                continue
+            base = i * LOCATIONS
+            yield (users[user[i]], dates[date[i]],
+                   [(str(scores[k]), emojis[emoji[k]]) for k in range(base, base + nloc[i])], str(total[i]))
+
+    def keys(self):
+        """game_key() of every game, built from the columns"""
+        cols = self.columns
+        users = [user.strip().lower() for user in self.users]
+        dates, odd = self.dates, self.odd
+        user, date, total, nloc, scores = cols['user'], cols['date'], cols['total'], cols['nloc'], cols['scores']
+        keys = []
+        for i in range(len(self)):
+            if odd and i in odd:
+                keys.append(game_key(odd[i]))
+                continue
+            base = i * LOCATIONS
+            score_part = '-'.join(str(key_score(score)) for score in scores[base:base + nloc[i]])
+            keys.append(f"{users[user[i]]}|{dates[date[i]]}|{score_part}|{total[i]}")
+        return keys
+
+    def iter_rows(self):
+        """CSV rows of every game, as game_rows() would write them"""
+        cols = self.columns
+        users, dates, emojis, odd = self.users, self.dates, self.emojis, self.odd
+        user, date, total, nloc, scores, emoji = (cols['user'], cols['date'], cols['total'], cols['nloc'],
+                                                  cols['scores'], cols['emojis'])
+        for i in range(len(self)):
+            if odd and i in odd:
+                yield from game_rows(odd[i])
+                continue
+            prefix = f"{users[user[i]]},{dates[date[i]]},"
+            base = i * LOCATIONS
+            for k in range(nloc[i]):
+                yield f"{prefix}{k + 1},{scores[base + k]},{emojis[emoji[base + k]]},{total[i]}"
+
+    @property
+    def extras(self):
+        """(row, line) for the rows of games kept as tuples, as in GameStore.extras"""
+        extras = []
+        row = 0
+        for i, count in enumerate(self.columns['nloc']):
+            if i in self.odd:
+                extras.extend((row + k, line) for k, line in enumerate(game_rows(self.odd[i])))
+                row += len(self.odd[i][2])
+            else:
+                row += count
+        return extras
+
+    def ordinals(self):
+        """Proleptic Gregorian day number of every game's date (0 if it isn't YYYY-MM-DD)"""
+        days = []
+        for date in self.dates:
+            try:
+                days.append(datetime.date.fromisoformat(date.strip()).toordinal())
+            except ValueError:
+                days.append(0)
+        column = self.columns['date']
+        return array('i', (0 if i in self.odd else days[column[i]] for i in range(len(self))))
+
+    def to_numpy(self):
+        """Columns as NumPy arrays sharing the batch's memory; scores/emojis are (n, 5)"""
+        return columns_to_numpy(self.columns)
+
+
+def iter_batches(games, size=BATCH_GAMES):
+    """Encode games into GameBatches of up to size games that share one set of dictionaries.
+
+    Each game is encoded as soon as it is yielded, so the batches hold no
+    tuples beyond the odd ones.
+    """
+    batch = GameBatch()
+    for game in games:
+        batch.append(game)
+        if len(batch) == size:
+            yield batch
+            batch = GameBatch.like(batch)
+    if len(batch):
+        yield batch
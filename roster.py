@@ -0,0 +1,135 @@
+"""Player roster shared by both parsers.
+
+A roster file lists the players to pick up, the players to leave out and
+aliases that map other spellings to a player:
+
+    {
+      "players": ["Stephen Alexander", "David Ellis"],
+      "exclude": ["Abigail Jenquist"],
+      "aliases": {"Steve A": "Stephen Alexander"},
+      "exclude_digests": false
+    }
+
+Exclusions apply to chat exports. Digests list every player and have always
+been taken in full, so excluded players are only dropped from digests when
+"exclude_digests" is true.
+
+Every name and alias is compiled into a single regex shaped like a trie
+(names sharing a prefix share one branch), so finding a name in a line costs
+one scan however many players are configured.
+"""
+import json
+import os
+import re
+
+ROSTER_FILE = 'roster.json'
+
+# Used when there is no roster file
+DEFAULT_PLAYERS = ('Stephen Alexander', 'Ellie Alexander', 'David Ellis', 'Ashley Ellis', 'scott caskey')
+DEFAULT_EXCLUDE = ('Abigail Jenquist', 'Joshua Jenquist')
+
+
+def trie_regex(words):
+    """Regex source matching any of words, factored into a trie"""
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    return _trie_source(trie)
+
+
+def _trie_source(node):
+    ends = '' in node
+    branches = [re.escape(char) + _trie_source(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ''
+    if len(branches) == 1 and not ends:
+        return branches[0]
+    # Greedy ? keeps the longest name when one is a prefix of another
+    return '(?:' + '|'.join(branches) + ')' + ('?' if ends else '')
+
+
+class Roster:
+    """Players, exclusions and aliases, matched case-insensitively"""
+
+    def __init__(self, players=DEFAULT_PLAYERS, exclude=DEFAULT_EXCLUDE, aliases=None, exclude_digests=False):
+        aliases = aliases or {}
+        self.players = tuple(players)
+        self.exclude = tuple(exclude)
+        self.exclude_digests = exclude_digests
+        self.excluded = {name.lower() for name in self.exclude}
+        # Lowercased alias -> player name; aliases of excluded players are excluded too
+        self.aliases = {}
+        # Lowercased alias of an excluded player -> player name, for digests
+        self.excluded_aliases = {}
+        for alias, name in aliases.items():
+            if name.lower() in self.excluded:
+                self.excluded.add(alias.lower())
+                self.excluded_aliases[alias.lower()] = name
+            else:
+                self.aliases[alias.lower()] = name
+        keys = {name.lower() for name in self.players} | self.excluded | set(self.aliases)
+        self.pattern = re.compile(trie_regex(sorted(keys))) if keys else None
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        return cls(config.get('players', ()), config.get('exclude', ()), config.get('aliases', {}),
+                   config.get('exclude_digests', False))
+
+    def find(self, lowered, raw):
+        """Find the player named in a line.
+
+        Takes the line lowercased and as written. Returns (name, excluded), or
+        None if no roster name appears. An excluded name anywhere in the line
+        wins; otherwise the first name is returned as written in the line, or
+        as its player's name for an alias.
+        """
+        if self.pattern is None:
+            return None
+        first = None
+        for match in self.pattern.finditer(lowered):
+            key = match.group()
+            if key in self.excluded:
+                return key, True
+            if first is None:
+                first = match
+        if first is None:
+            return None
+        key = first.group()
+        if key in self.aliases:
+            return self.aliases[key], False
+        # Lowercasing keeps offsets except for a few exotic characters
+        name = raw[first.start():first.end()] if len(raw) == len(lowered) else key
+        return name.strip(), False
+
+    def resolve(self, name):
+        """Player for a name given on its own, e.g. in a digest line.
+
+        Names that aren't on the roster are kept as written. Excluded players
+        resolve like any other unless exclude_digests is set, then to None.
+        """
+        key = name.strip().lower()
+        if key in self.excluded:
+            if self.exclude_digests:
+                return None
+            return self.excluded_aliases.get(key, name.strip())
+        return self.aliases.get(key, name.strip())
+
+
+def add_roster_argument(parser):
+    """Add the --roster option to an ingest's argument parser; pass its value to load_roster()"""
+    parser.add_argument('--roster',
+                        help='roster JSON of players, exclusions and aliases (default: roster.json if present)')
+
+
+def load_roster(path=None):
+    """Load a roster file; without a path, roster.json if present, else the built-in roster"""
+    if path is None:
+        if not os.path.exists(ROSTER_FILE):
+            return Roster()
+        path = ROSTER_FILE
+    return Roster.from_file(path)
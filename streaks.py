@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""Streaks and rolling averages kept current one game at a time.
+
+Each player's state holds the last date played, the current run of
+consecutive days (start and length), the longest run so far and a ring
+buffer of their last 30 daily totals, so a game on a later date updates it
+in constant time. The dashboard-wide 7- and 30-day rolling averages work
+the same way over a window of the last 30 distinct game dates and their
+totals. Only that much is saved, so loading the state doesn't depend on
+how much history there is. A game dated before a player's last date (a late
+import) can't be placed from it, so the state is rebuilt from data.csv.
+
+As in server.js, one game counts per player and date (the first one seen),
+streaks are runs of calendar days, and rolling averages are over distinct
+game dates. The state is saved in .maptap/streaks.json together with the
+state of data.csv it describes; rows appended to data.csv outside the
+ingest tools are folded in on load, and any other change rebuilds it. A
+partition directory (see partitions.py) works the same way, except that any
+change to its manifest outside an append rebuilds the state.
+"""
+import argparse
+import datetime
+import json
+import math
+import os
+from collections import deque
+
+from datafile import DATA_CSV, data_source, sort_key
+
+STATE_VERSION = 2
+RING_SIZE = 30
+ROLLING_WINDOWS = (('sevenDay', 7), ('thirtyDay', 30))
+
+
+def js_round(value):
+    """Math.round: halves round up, unlike Python's round()"""
+    return math.floor(value + 0.5)
+
+
+def next_day(date):
+    """The day after date, or None if it isn't YYYY-MM-DD"""
+    try:
+        return (datetime.date.fromisoformat(date) + datetime.timedelta(days=1)).isoformat()
+    except ValueError:
+        return None
+
+
+def rolling_averages(date_totals):
+    """7- and 30-day rolling averages of the daily average score over the distinct game dates.
+
+    date_totals maps date -> [sum of totals, games]. The engine below,
+    build_snapshots.py and query_engine.py all use this one calculation.
+    """
+    dates = sorted(date_totals)
+    daily_avg = [date_totals[date][0] / date_totals[date][1] for date in dates]
+    result = {}
+    for name, window in ROLLING_WINDOWS:
+        result[name] = []
+        for i in range(window - 1, len(dates)):
+            window_sum = sum(daily_avg[i - window + 1:i + 1])
+            result[name].append({'date': dates[i], 'avgScore': js_round(window_sum / window)})
+    return result
+
+
+class PlayerStreak:
+    """One player's streaks and recent daily totals"""
+
+    def __init__(self, state=None):
+        state = state or {}
+        self.last = state.get('last')
+        self.start = state.get('start')
+        self.length = state.get('length', 0)
+        self.longest = state.get('longest')
+        self.recent = deque(state.get('recent', ()), maxlen=RING_SIZE)
+
+    def add(self, date, total):
+        """Record a game on or after the last date; returns False if the player already has one that day"""
+        if date == self.last:
+            return False
+        if self.last is not None and next_day(self.last) == date:
+            self.length += 1
+        else:
+            self.start, self.length = date, 1
+        self.last = date
+        self.recent.append(total)
+        if self.longest is None or self.length > self.longest['streak']:
+            self.longest = {'streak': self.length, 'startDate': self.start, 'endDate': date}
+        return True
+
+    def to_state(self):
+        return {'last': self.last, 'start': self.start, 'length': self.length, 'longest': self.longest,
+                'recent': list(self.recent)}
+
+    def rolling(self):
+        """Average daily total over the last 7 and 30 days played, None until there are that many"""
+        result = {}
+        for name, window in ROLLING_WINDOWS:
+            if len(self.recent) < window:
+                result[name] = None
+            else:
+                result[name] = js_round(sum(list(self.recent)[-window:]) / window)
+        return result
+
+
+class StreakEngine:
+    """Streaks per player and dashboard-wide rolling averages, updated per game"""
+
+    def __init__(self):
+        self.players = {}
+        # The last RING_SIZE distinct game dates, oldest first
+        self.window = deque(maxlen=RING_SIZE)
+        # date -> [sum of totals, players] for the dates in the window
+        self.date_totals = {}
+        self.source = None
+        # Set when a game came in before a player's last date; see rebuild()
+        self.stale = False
+
+    def add_game(self, game):
+        user, date, _, total = game
+        user = user.strip().lower()
+        player = self.players.get(user)
+        if player is None:
+            player = self.players[user] = PlayerStreak()
+        elif player.last is not None and date < player.last:
+            # Whether this is a new day for the player, and how it changes
+            # their runs, is only known from the whole file
+            self.stale = True
+            return
+        if not player.add(date, int(total)):
+            return
+
+        day = self.date_totals.get(date)
+        if day is not None:
+            day[0] += int(total)
+            day[1] += 1
+            return
+        if len(self.window) == RING_SIZE and date < self.window[0]:
+            # Too old to be one of the last RING_SIZE dates
+            return
+        self.date_totals[date] = [int(total), 1]
+        if not self.window or date > self.window[-1]:
+            if len(self.window) == RING_SIZE:
+                del self.date_totals[self.window[0]]
+            self.window.append(date)
+        else:
+            # A new date inside the window shifts it
+            dates = sorted(self.date_totals)
+            for old in dates[:-RING_SIZE]:
+                del self.date_totals[old]
+            self.window = deque(dates[-RING_SIZE:], maxlen=RING_SIZE)
+
+    def add_games(self, games):
+        for game in games:
+            self.add_game(game)
+
+    @property
+    def most_recent(self):
+        return self.window[-1] if self.window else None
+
+    def streaks(self):
+        """Current and longest streaks, shaped like the streaks in /api/analytics"""
+        current = [{'user': user, 'streak': p.length, 'startDate': p.start, 'endDate': p.last, 'isActive': True}
+                   for user, p in self.players.items() if p.last == self.most_recent]
+        longest = [dict(user=user, **p.longest) for user, p in self.players.items()]
+        current.sort(key=lambda s: -s['streak'])
+        longest.sort(key=lambda s: -s['streak'])
+        return {'currentStreaks': current, 'longestStreaks': longest}
+
+    def rolling(self):
+        """Latest 7- and 30-day rolling averages of the daily average score"""
+        series = rolling_averages(self.date_totals)
+        return {name: values[-1] if values else None for name, values in series.items()}
+
+    def summary(self):
+        return {
+            'mostRecentDate': self.most_recent,
+            'streaks': self.streaks(),
+            'rollingAverages': self.rolling(),
+            'players': {user: {'currentStreak': p.length if p.last == self.most_recent else 0,
+                               'lastDate': p.last, 'longestStreak': p.longest, 'rollingAverages': p.rolling()}
+                        for user, p in sorted(self.players.items())},
+        }
+
+    def rebuild(self, data_path=DATA_CSV):
+        """Recompute everything from data_path, reading each player's games in date order"""
+        source = data_source(data_path)
+        self.__init__()
+        games = list(source.iter_games())
+        # Players are listed in the order they appear in the file, as on a
+        # full read; a stable sort keeps the first game of each day first
+        for user, _, _, _ in games:
+            self.players.setdefault(user.strip().lower(), PlayerStreak())
+        self.add_games(sorted(games, key=lambda game: sort_key(game[0], game[1])))
+        self.source = source.state()
+
+    def to_state(self):
+        return {
+            'version': STATE_VERSION,
+            'source': self.source,
+            'players': {user: p.to_state() for user, p in self.players.items()},
+            'window': [[date] + self.date_totals[date] for date in self.window],
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        engine = cls()
+        engine.source = state['source']
+        engine.players = {user: PlayerStreak(player) for user, player in state['players'].items()}
+        for date, total, count in state['window']:
+            engine.window.append(date)
+            engine.date_totals[date] = [total, count]
+        return engine
+
+    @classmethod
+    def load(cls, data_path=DATA_CSV):
+        """Saved state for data_path, brought up to date with the file"""
+        source = data_source(data_path)
+        try:
+            with open(source.state_path('streaks.json'), 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            engine = cls.from_state(state) if state.get('version') == STATE_VERSION else cls()
+        except (OSError, ValueError):
+            engine = cls()
+        offset = source.changed_since(engine.source)
+        if offset is None:
+            return engine
+        if offset:
+            engine.add_games(source.iter_games(offset))
+        if offset == 0 or engine.stale:
+            engine.rebuild(source)
+        engine.source = source.state()
+        return engine
+
+    def save(self, data_path=DATA_CSV):
+        """Save the state as describing data_path as it is now"""
+        source = data_source(data_path)
+        self.source = source.state()
+        path = source.state_path('streaks.json')
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.to_state(), f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp, path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Show current streaks and rolling averages')
+    parser.add_argument('--data', default=DATA_CSV, help='game data file')
+    parser.add_argument('--rebuild', action='store_true', help='ignore saved state and rebuild it')
+    args = parser.parse_args(argv)
+
+    if args.rebuild:
+        engine = StreakEngine()
+        engine.rebuild(args.data)
+    else:
+        engine = StreakEngine.load(args.data)
+    engine.save(args.data)
+    print(json.dumps(engine.summary(), ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
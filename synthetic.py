@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Deterministic synthetic MapTap data for benchmarks.
+
+Generates iMessage exports, "Month D: Name: scores, Final: N" digests and
+data.csv files of any size from a seed. The exports mimic real ones: chatter
+and timestamps between games, skipped players, several plays on one day,
+"Final score" on the score line or the line after it, and emoji glyphs that
+export as a digit and merge into the score (93 followed by "1" -> "931").
+"""
+import argparse
+import datetime
+import random
+
+from datafile import HEADER, WEIGHTS
+
+PLAYERS = ('Stephen Alexander', 'Ellie Alexander', 'David Ellis', 'Ashley Ellis', 'scott caskey')
+SKIPPED = ('Abigail Jenquist', 'Joshua Jenquist')
+# (minimum score, emoji) bands, best first
+EMOJI_BANDS = (
+    (100, '🎯'), (95, '🏆'), (90, '🥇'), (85, '👑'), (80, '🔥'), (70, '✨'),
+    (60, '🙂'), (50, '🤔'), (40, '😟'), (20, '😞'), (0, '😭'),
+)
+# How emojis come out in a text export: mostly symbols, sometimes a digit
+EXPORT_GLYPHS = ('!', '"', '&', '#', "'", '(', '+', '.', '$', '?')
+MERGED_DIGITS = ('1', '3', '5', '7')
+CHATTER = ('lol', 'nice one', 'brutal last round', 'Loved "MapTap"', 'how did you get that',
+           'Read 9:41 AM', 'Delivered')
+MONTH_NAMES = {10: ('October', 'Oct'), 11: ('November', 'Nov'), 12: ('December', 'Dec')}
+# The parsers only know the October-December 2025 season, so dates cycle through it
+SEASON_START = datetime.date(2025, 10, 1)
+SEASON_DAYS = 92
+
+
+def emoji_for(score):
+    for minimum, emoji in EMOJI_BANDS:
+        if score >= minimum:
+            return emoji
+    return EMOJI_BANDS[-1][1]
+
+
+def season_date(day):
+    return SEASON_START + datetime.timedelta(days=day % SEASON_DAYS)
+
+
+class Generator:
+    """Random games from a fixed seed"""
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+
+    def scores(self):
+        rng = self.rng
+        return [min(100, max(0, int(rng.gauss(82, 18)))) for _ in WEIGHTS]
+
+    def iter_games(self):
+        """Yield (user, date, scores, total) forever, day by day"""
+        rng = self.rng
+        day = 0
+        while True:
+            date = season_date(day)
+            for user in PLAYERS + SKIPPED:
+                if rng.random() < 0.8:
+                    for _ in range(2 if rng.random() < 0.1 else 1):
+                        scores = self.scores()
+                        yield user, date, scores, sum(s * w for s, w in zip(scores, WEIGHTS))
+            day += 1
+
+    def export_glyph(self, score):
+        """Emoji as it appears in a text export, sometimes a digit merged onto the score"""
+        rng = self.rng
+        if rng.random() < 0.05:
+            return rng.choice(MERGED_DIGITS)
+        return rng.choice(EXPORT_GLYPHS) if rng.random() < 0.7 else emoji_for(score)
+
+    def iter_export_lines(self, lines):
+        """Yield about the given number of iMessage export lines"""
+        rng = self.rng
+        emitted = 0
+        for user, date, scores, total in self.iter_games():
+            block = []
+            if rng.random() < 0.3:
+                block.append(f"{date:%b} {date.day}, 2025 at {rng.randint(6, 11)}:{rng.randint(0, 59):02d} AM")
+            block.append(user if rng.random() < 0.95 else user.upper())
+            month = rng.choice(MONTH_NAMES[date.month])
+            block.append(f"www.MapTap.gg {month} {date.day}" if rng.random() < 0.5 else f"MapTap {month} {date.day}")
+            score_line = ' '.join(f"{s}{self.export_glyph(s)}" for s in scores)
+            if rng.random() < 0.5:
+                block.append(f"{score_line} Final score: {total}")
+            else:
+                block.extend([score_line, f"Final score: {total}"])
+            if rng.random() < 0.2:
+                block.append(rng.choice(CHATTER))
+            block.append('')
+            yield from block
+            emitted += len(block)
+            if emitted >= lines:
+                return
+
+    def iter_digest_lines(self, lines):
+        """Yield digest lines in parse_entries.py format"""
+        for i, (user, date, scores, total) in enumerate(self.iter_games()):
+            if i >= lines:
+                return
+            month = MONTH_NAMES[date.month][1]
+            tokens = ' '.join(f"{s}{self.export_glyph(s)}" for s in scores)
+            yield f"{month} {date.day}: {user}: {tokens}, Final: {total}"
+
+    def iter_csv_lines(self, rows):
+        """Yield a header and about the given number of data.csv rows"""
+        yield HEADER
+        emitted = 0
+        for user, date, scores, total in self.iter_games():
+            for loc_num, score in enumerate(scores, 1):
+                yield f"{user},{date.isoformat()},{loc_num},{score},{emoji_for(score)},{total}"
+            emitted += len(scores)
+            if emitted >= rows:
+                return
+
+
+def write_lines(path, lines):
+    with open(path, 'w', encoding='utf-8') as f:
+        for line in lines:
+            f.write(line + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate synthetic MapTap benchmark data')
+    parser.add_argument('kind', choices=('export', 'digest', 'csv'))
+    parser.add_argument('size', type=int, help='lines (export/digest) or rows (csv)')
+    parser.add_argument('output')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    generator = Generator(args.seed)
+    lines = {
+        'export': generator.iter_export_lines,
+        'digest': generator.iter_digest_lines,
+        'csv': generator.iter_csv_lines,
+    }[args.kind](args.size)
+    write_lines(args.output, lines)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+import json
+import os
+
+import build_snapshots
+from build_snapshots import SnapshotBuilder
+from datafile import HEADER
+from dedup_index import DedupIndex
+from partitions import PartitionStore
+from streaks import StreakEngine
+
+
+def game(user, date, total):
+    return (user, date, [(str(total // 5), '🎯')] * 5, str(total))
+
+
+def read_snapshots(out_dir):
+    snapshots = {}
+    for root, _, files in os.walk(out_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            with open(path, encoding='utf-8') as f:
+                snapshots[os.path.relpath(path, out_dir)] = json.load(f)
+    del snapshots['manifest.json']
+    return snapshots
+
+
+def test_appends_stay_incremental(tmp_path):
+    data = tmp_path / 'data.csv'
+    data.write_text(HEADER + '\n', encoding='utf-8')
+    with DedupIndex(str(data)) as index:
+        index.append([game('Ryan', '2025-10-02', 700), game('Ashley', '2025-10-01', 500)])
+        # A new player sorting first and a late game both land mid-file
+        index.append([game('Abby', '2025-10-03', 600), game('Ryan', '2025-10-01', 650)])
+
+    # The snapshots describe data.csv as the last merge left it
+    assert SnapshotBuilder.load(str(data)).current
+
+    incremental = read_snapshots(tmp_path / 'public' / 'snapshots')
+    build_snapshots.build(str(data), str(tmp_path / 'full'), rebuild=True)
+    assert incremental == read_snapshots(tmp_path / 'full')
+    assert [entry['user'] for entry in incremental['leaderboard.json']] == ['ryan', 'abby', 'ashley']
+
+
+def test_partition_appends_stay_current(tmp_path):
+    store = PartitionStore(str(tmp_path / 'partitions'))
+    store.append([game('Ryan', '2025-10-31', 700), game('Ashley', '2025-11-01', 500)])
+    # A late game in an earlier month rebuilds the streaks from every partition
+    store.append([game('Abby', '2025-11-02', 600), game('Ryan', '2025-10-30', 650), game('Ryan', '2025-11-01', 400)])
+
+    data = tmp_path / 'data.csv'
+    store.export(str(data))
+    build_snapshots.build(str(data), str(tmp_path / 'full'), rebuild=True)
+    assert read_snapshots(tmp_path / 'public' / 'snapshots') == read_snapshots(tmp_path / 'full')
+    streaks = StreakEngine.load(store)
+    assert streaks.summary() == StreakEngine.load(str(data)).summary()
+    assert streaks.players['ryan'].length == 3
+
+
+def test_malformed_dates(tmp_path):
+    data = tmp_path / 'data.csv'
+    data.write_text(HEADER + '\n', encoding='utf-8')
+    with DedupIndex(str(data)) as index:
+        index.append([game('Ryan', '2025-10-01', 700), game('Ryan', 'someday', 500)])
+        index.append([game('Ryan', 'tomorrow', 600)])
+    snapshots = read_snapshots(tmp_path / 'public' / 'snapshots')
+    # Keyed as server.js's getPeriodKey() keys them
+    assert [a['period'] for a in snapshots['aggregations-week.json']['aggregations']] == ['2025-W40', 'NaN-WNaN']
+    assert StreakEngine.load(str(data)).players['ryan'].length == 1
@@ -0,0 +1,100 @@
+import os
+
+from datafile import (HEADER, game_key, game_rows, iter_csv_blocks, iter_csv_games, iter_game_keys, merge_games,
+                      open_at, sort_key)
+
+REPO_DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data.csv')
+
+
+def game(user, date, total, scores=(90, 80, 70, 60, 50)):
+    return (user, date, [(str(score), '🎯') for score in scores], str(total))
+
+
+def csv_lines(*games):
+    return [row + '\n' for g in games for row in game_rows(g)]
+
+
+def write_csv(path, *games, header=True):
+    path.write_text((HEADER + '\n' if header else '') + ''.join(csv_lines(*games)), encoding='utf-8')
+
+
+def test_blocks_split_like_games():
+    games = [game('Ashley', '2025-10-01', 350), game('Ashley', '2025-10-01', 351), game(' Ryan ', '2025-10-02', 350)]
+    lines = [HEADER + '\n'] + csv_lines(*games)
+    blocks = list(iter_csv_blocks(lines))
+    assert [key for key, _ in blocks] == [sort_key(g[0], g[1]) for g in list(iter_csv_games(lines))]
+    assert [rows for _, rows in blocks] == [csv_lines(g) for g in games]
+
+
+def test_blocks_keep_unparsed_rows():
+    lines = csv_lines(game('Ashley', '2025-10-01', 350))
+    lines[2:2] = ['Ryan,2025-10-02,x,90,🎯,350\n']
+    lines[-1] = lines[-1].rstrip('\n')
+    blocks = list(iter_csv_blocks(lines))
+    assert [len(rows) for _, rows in blocks] == [2, 1, 3]
+    assert blocks[1] == (('ryan', '2025-10-02'), ['Ryan,2025-10-02,x,90,🎯,350\n'])
+    assert blocks[2][1][-1].endswith('\n')
+
+
+def test_merge_into_sorted_file(tmp_path):
+    data = tmp_path / 'data.csv'
+    existing = [game('Ashley', '2025-10-01', 350), game('ryan', '2025-10-03', 350)]
+    write_csv(data, *existing)
+    before = data.read_text(encoding='utf-8')
+    new = [game('Ryan', '2025-10-01', 400), game('Ashley', '2025-10-01', 351), game('Abby', '2025-10-05', 300)]
+    merge_games(str(data), new)
+    # Existing rows are copied through verbatim and come first on ties
+    expected = [new[2], existing[0], new[1], new[0], existing[1]]
+    assert data.read_text(encoding='utf-8') == HEADER + '\n' + ''.join(csv_lines(*expected))
+    assert set(before.splitlines()) <= set(data.read_text(encoding='utf-8').splitlines())
+
+
+def test_merge_sorts_an_unsorted_file(tmp_path):
+    data = tmp_path / 'data.csv'
+    existing = [game('Ryan', '2025-10-02', 350), game('Ashley', '2025-10-03', 350)]
+    write_csv(data, *existing, header=False)
+    merge_games(str(data), [game('Ashley', '2025-10-01', 300)])
+    with open(data, encoding='utf-8') as f:
+        merged = list(iter_csv_games(f))
+    assert [(g[0], g[1]) for g in merged] == [('Ashley', '2025-10-01'), ('Ashley', '2025-10-03'),
+                                              ('Ryan', '2025-10-02')]
+    assert data.read_text(encoding='utf-8').startswith(HEADER + '\n')
+
+
+def test_merge_creates_missing_file_and_skips_empty(tmp_path):
+    data = tmp_path / 'data.csv'
+    merge_games(str(data), [])
+    assert not data.exists()
+    merge_games(str(data), [game('Ashley', '2025-10-01', 350)])
+    assert data.read_text(encoding='utf-8') == HEADER + '\n' + ''.join(csv_lines(game('Ashley', '2025-10-01', 350)))
+
+
+def keys_from_games(path, offset=0):
+    with open_at(path, offset) as f:
+        return [game_key(g) for g in iter_csv_games(f)]
+
+
+def test_scanned_keys_match_game_key(tmp_path):
+    data = tmp_path / 'data.csv'
+    lines = [HEADER + '\n'] + csv_lines(game('Ashley', '2025-10-01', 350), game('Ashley', '2025-10-01', 350))
+    lines += csv_lines(game(' David Ellis ', '2025-10-02', 853, (99, 931, 87, 81, 82)), game('RYAN', '2025-10-02', 300))
+    lines += [
+        # Comma emoji, CRLF, a zero-padded total and a partial game
+        'Megan,2025-10-03,1,90,,,0350\r\n', 'Megan,2025-10-03,2,80,🎯,0350\r\n',
+        'Megan,2025-10-03,3,70,🎯,0350\r\n',
+        # Rows that don't parse are skipped
+        'Megan,2025-10-03,x,60,🎯,350\n', 'broken row\n',
+        'Megan,2025-10-04,1,60,🎯,350\n', 'Megan,2025-10-04,1,61,🎯,350\n',
+    ]
+    lines += csv_lines(game('Ashley', '2025-10-05', 400))
+    data.write_text(''.join(lines), encoding='utf-8')
+    assert list(iter_game_keys(str(data))) == keys_from_games(str(data))
+
+    # From a game boundary part way through, as after an append
+    offset = len(''.join(lines[:11]).encode('utf-8'))
+    assert list(iter_game_keys(str(data), offset)) == keys_from_games(str(data), offset)
+    assert list(iter_game_keys(str(data), data.stat().st_size)) == []
+
+
+def test_scanned_keys_match_on_repo_data():
+    assert list(iter_game_keys(REPO_DATA)) == keys_from_games(REPO_DATA)
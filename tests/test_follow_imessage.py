@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+import follow_imessage
+from datafile import HEADER, state_path
+from partitions import open_index
+
+USER_AND_DATE = "David Ellis\nwww.MapTap.gg October 23\n"
+SCORES = "99! 91' 87( 81# 82#\n"
+ROW = 'David Ellis,2025-10-23,1,99,'
+
+
+@pytest.fixture
+def data(tmp_path):
+    path = tmp_path / 'data.csv'
+    path.write_text(HEADER + '\n', encoding='utf-8')
+    return str(path)
+
+
+def poll(data, export, once=False):
+    """Poll export with a follower loading its checkpoints from disk, as a new run would"""
+    with open_index(data, None) as index:
+        follower = follow_imessage.Follower(index, state_path(data, 'follow.json'), once=once)
+        follower.poll([str(export)])
+    return follower
+
+
+def test_once_reads_last_line_without_newline(tmp_path, capsys, data):
+    export = tmp_path / 'export.txt'
+    export.write_text(USER_AND_DATE + SCORES.rstrip('\n') + " Final score: 853", encoding='utf-8')
+    poll(data, export, once=True)
+    assert capsys.readouterr().out.startswith(ROW)
+
+
+def test_last_line_waits_until_the_file_stops_growing(tmp_path, capsys, data):
+    export = tmp_path / 'export.txt'
+    export.write_text(USER_AND_DATE + SCORES + "Final score: 853", encoding='utf-8')
+    with open_index(data, None) as index:
+        follower = follow_imessage.Follower(index, state_path(data, 'follow.json'))
+        follower.poll([str(export)])
+        assert capsys.readouterr().out == ''
+        # Same size and mtime on the next poll: the line is finished
+        follower.poll([str(export)])
+        assert capsys.readouterr().out.startswith(ROW)
+        follower.poll([str(export)])
+        assert capsys.readouterr().out == ''
+    with open(state_path(data, 'follow.json'), encoding='utf-8') as f:
+        assert json.load(f)[str(export)]['file']['size'] == export.stat().st_size
+
+
+def test_resumes_a_pending_score_line(tmp_path, capsys, data):
+    export = tmp_path / 'export.txt'
+    # The score line is still waiting for its "Final score" line
+    export.write_text(USER_AND_DATE + SCORES, encoding='utf-8')
+    poll(data, export)
+    assert capsys.readouterr().out == ''
+    with open(state_path(data, 'follow.json'), encoding='utf-8') as f:
+        checkpoint = json.load(f)[str(export)]
+    assert checkpoint['file']['size'] == export.stat().st_size
+    assert checkpoint['parser']['pending'] is not None
+
+    with open(export, 'a', encoding='utf-8') as f:
+        f.write("Final score: 853\n")
+    poll(data, export)
+    rows = capsys.readouterr().out.splitlines()
+    assert len(rows) == 5 and rows[0].startswith(ROW) and rows[0].endswith(',853')
+
+    # Nothing new: nothing is read again
+    poll(data, export)
+    assert capsys.readouterr().out == ''
+
+
+def test_rewritten_file_is_read_again(tmp_path, capsys, data):
+    export = tmp_path / 'export.txt'
+    export.write_text(USER_AND_DATE + SCORES + "Final score: 853\n", encoding='utf-8')
+    poll(data, export)
+    assert capsys.readouterr().out.startswith(ROW)
+    export.write_text("Ashley Ellis\nwww.MapTap.gg October 24\n" + SCORES + "Final score: 853\n", encoding='utf-8')
+    poll(data, export)
+    assert capsys.readouterr().out.startswith('Ashley Ellis,2025-10-24,1,99,')
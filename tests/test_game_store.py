@@ -0,0 +1,62 @@
+from datafile import HEADER
+from game_store import GameStore
+from test_datafile import REPO_DATA, csv_lines, game
+
+# Rows the columns can't hold as written, kept verbatim in place
+ODD_ROWS = [
+    'Megan,2025-10-03,1,05,🎯,350\n',  # zero-padded score
+    'Megan,2025-10-03,1,40000,🎯,350\n',  # score too large for its column
+    'Megan,2025-10-03,1,90,🎯,0350\n',  # zero-padded total
+    'Megan,2025-10-03,1,90,🎯,350\r\n',  # CRLF
+    ' Ryan ,2025-10-03,1,90,🎯,350\n',  # padded name
+    'Megan,2025-10-03,6,90,🎯,350\n',  # sixth location
+    'Megan,2025-10-03,x,90,🎯,350\n',
+    'broken row\n',
+    '\n',
+]
+
+
+def round_trip(tmp_path, text):
+    data = tmp_path / 'data.csv'
+    data.write_bytes(text.encode('utf-8'))
+    store = GameStore.from_csv(str(data))
+    store.write_csv(str(tmp_path / 'encoded.csv'))
+    store.save(str(tmp_path / 'store'))
+    loaded = GameStore.load(str(tmp_path / 'store'))
+    try:
+        loaded.write_csv(str(tmp_path / 'loaded.csv'))
+        assert list(loaded.iter_games()) == list(store.iter_games())
+    finally:
+        loaded.close()
+    assert (tmp_path / 'encoded.csv').read_bytes() == data.read_bytes()
+    assert (tmp_path / 'loaded.csv').read_bytes() == data.read_bytes()
+    return store
+
+
+def test_round_trip_with_rows_that_dont_fit(tmp_path):
+    lines = [HEADER + '\n'] + csv_lines(game('Ashley', '2025-10-01', 350))
+    # Between the rows of a game and between games
+    lines[3:3] = ODD_ROWS[:3]
+    lines += ODD_ROWS[3:]
+    lines += csv_lines(game('David Ellis', '2025-10-02', 853, (99, 931, 87, 81, 82)))
+    # Comma emoji and a partial game fit the columns
+    lines += ['Megan,2025-10-04,1,90,,,640\n', 'Megan,2025-10-04,2,80,🎯,640\n', 'Megan,2025-10-04,3,70,🎯,640\n']
+    store = round_trip(tmp_path, ''.join(lines))
+
+    assert [line for _, line in store.extras] == [row.rstrip('\n') for row in ODD_ROWS]
+    # The game around the odd rows stays whole
+    assert list(store.iter_games()) == [
+        game('Ashley', '2025-10-01', 350),
+        game('David Ellis', '2025-10-02', 853, (99, 931, 87, 81, 82)),
+        ('Megan', '2025-10-04', [('90', ','), ('80', '🎯'), ('70', '🎯')], '640'),
+    ]
+
+
+def test_round_trip_without_header(tmp_path):
+    store = round_trip(tmp_path, ''.join(csv_lines(game('Ashley', '2025-10-01', 350))))
+    assert store.header is None and not store.extras
+
+
+def test_round_trip_repo_data(tmp_path):
+    with open(REPO_DATA, encoding='utf-8', newline='') as f:
+        round_trip(tmp_path, f.read())
@@ -0,0 +1,121 @@
+import json
+import sqlite3
+
+import pytest
+
+import imessage_db
+from datafile import HEADER
+
+CONTACTS = {'+15550001': 'David Ellis', '+15550002': 'Abigail Jenquist'}
+DAVID_GAME = "www.MapTap.gg October 23\n99! 91' 87( 81# 82#\nFinal score: 853"
+
+
+def make_chat_db(path):
+    """A minimal chat.db with the tables and columns imessage_db.py reads"""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE handle (ROWID INTEGER PRIMARY KEY, id TEXT);
+        CREATE TABLE message (ROWID INTEGER PRIMARY KEY, date INTEGER, text TEXT,
+                              is_from_me INTEGER, handle_id INTEGER);
+        CREATE TABLE chat (ROWID INTEGER PRIMARY KEY, chat_identifier TEXT, display_name TEXT);
+        CREATE TABLE chat_message_join (chat_id INTEGER, message_id INTEGER);
+        INSERT INTO handle VALUES (1, '+15550001'), (2, '+15550002'), (3, '+15550003');
+        INSERT INTO chat VALUES (1, 'chat1', 'MapTap'), (2, 'chat2', 'Other');
+    """)
+    conn.commit()
+    return conn
+
+
+def add_message(conn, rowid, text, handle_id=0, from_me=False, chat_id=1):
+    conn.execute('INSERT INTO message VALUES (?, ?, ?, ?, ?)', (rowid, rowid * 1000, text, int(from_me), handle_id))
+    conn.execute('INSERT INTO chat_message_join VALUES (?, ?)', (chat_id, rowid))
+    conn.commit()
+
+
+@pytest.fixture
+def chat_db(tmp_path):
+    conn = make_chat_db(tmp_path / 'chat.db')
+    add_message(conn, 1, DAVID_GAME, handle_id=1)
+    add_message(conn, 2, "nice one", handle_id=1)
+    # Not in the contacts: must not be credited to the previous sender
+    add_message(conn, 3, "www.MapTap.gg October 23\n50! 50! 50! 50! 50!\nFinal score: 500", handle_id=3)
+    # Excluded player
+    add_message(conn, 4, "www.MapTap.gg October 23\n60! 60! 60! 60! 60!\nFinal score: 600", handle_id=2)
+    add_message(conn, 5, "www.MapTap.gg October 24\n70! 70! 70! 70! 70! Final score: 700", from_me=True)
+    yield conn
+    conn.close()
+
+
+def run(tmp_path, capsys, *extra):
+    """Run imessage_db.py against the fixture and return the printed rows"""
+    data = tmp_path / 'data.csv'
+    if not data.exists():
+        data.write_text(HEADER + '\n', encoding='utf-8')
+    contacts = tmp_path / 'contacts.json'
+    contacts.write_text(json.dumps(CONTACTS), encoding='utf-8')
+    imessage_db.main([str(tmp_path / 'chat.db'), '--contacts', str(contacts), '--data', str(data),
+                      '--watermark', str(tmp_path / 'watermark.json'), *extra])
+    return capsys.readouterr().out.splitlines()
+
+
+@pytest.fixture(autouse=True)
+def in_tmp(tmp_path, monkeypatch):
+    # Keep a roster.json in the working directory from affecting the tests
+    monkeypatch.chdir(tmp_path)
+
+
+def test_games_are_credited_to_their_sender(chat_db, tmp_path, capsys):
+    rows = run(tmp_path, capsys, '--me', 'Stephen Alexander')
+    assert rows == [
+        "David Ellis,2025-10-23,1,99,!,853",
+        "David Ellis,2025-10-23,2,91,',853",
+        "David Ellis,2025-10-23,3,87,(,853",
+        "David Ellis,2025-10-23,4,81,#,853",
+        "David Ellis,2025-10-23,5,82,#,853",
+    ] + [f"Stephen Alexander,2025-10-24,{loc},70,!,700" for loc in range(1, 6)]
+
+
+def test_messages_from_me_are_skipped_without_me(chat_db, tmp_path, capsys):
+    rows = run(tmp_path, capsys)
+    assert {row.split(',')[0] for row in rows} == {'David Ellis'}
+
+
+def test_watermark_only_reads_new_messages(chat_db, tmp_path, capsys):
+    assert len(run(tmp_path, capsys)) == 5
+    marks = json.loads((tmp_path / 'watermark.json').read_text(encoding='utf-8'))
+    assert list(marks.values()) == [{'rowid': 5, 'date': 5000}]
+
+    # Nothing new: nothing is read, and the watermark stays put
+    assert run(tmp_path, capsys) == []
+    assert json.loads((tmp_path / 'watermark.json').read_text(encoding='utf-8')) == marks
+
+    add_message(chat_db, 6, "www.MapTap.gg October 25\n80! 80! 80! 80! 80!\nFinal score: 800", handle_id=1)
+    rows = run(tmp_path, capsys)
+    assert rows == [f"David Ellis,2025-10-25,{loc},80,!,800" for loc in range(1, 6)]
+
+
+def test_watermark_defaults_to_next_to_the_data(chat_db, tmp_path, capsys):
+    data = tmp_path / 'site' / 'data.csv'
+    data.parent.mkdir()
+    data.write_text(HEADER + '\n', encoding='utf-8')
+    imessage_db.main([str(tmp_path / 'chat.db'), '--data', str(data)])
+    marks = json.loads((tmp_path / 'site' / '.maptap' / 'imessage_watermark.json').read_text(encoding='utf-8'))
+    assert list(marks.values()) == [{'rowid': 5, 'date': 5000}]
+    assert not (tmp_path / '.maptap').exists()
+
+
+def test_watermark_rewind_is_deduplicated(chat_db, tmp_path, capsys):
+    run(tmp_path, capsys, '--append')
+    (tmp_path / 'watermark.json').unlink()
+    run(tmp_path, capsys, '--append')
+    lines = (tmp_path / 'data.csv').read_text(encoding='utf-8').splitlines()
+    assert len(lines) == 1 + 5
+
+
+def test_chat_filter_and_per_chat_watermark(chat_db, tmp_path, capsys):
+    add_message(chat_db, 6, "www.MapTap.gg October 26\n90! 90! 90! 90! 90!\nFinal score: 900",
+                handle_id=1, chat_id=2)
+    assert {row.split(',')[1] for row in run(tmp_path, capsys, '--chat', 'Other')} == {'2025-10-26'}
+    assert {row.split(',')[1] for row in run(tmp_path, capsys, '--chat', 'MapTap')} == {'2025-10-23'}
+    marks = json.loads((tmp_path / 'watermark.json').read_text(encoding='utf-8'))
+    assert sorted(mark['rowid'] for mark in marks.values()) == [5, 6]
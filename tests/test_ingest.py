@@ -0,0 +1,68 @@
+import io
+import sys
+
+import pytest
+
+import ingest
+import parse_entries
+import parse_imessage
+from datafile import HEADER, game_rows
+from dedup_index import DedupIndex, iter_new_games
+from synthetic import Generator
+
+
+@pytest.fixture
+def sources(tmp_path):
+    phone = tmp_path / 'phone.txt'
+    phone.write_text('\n'.join(Generator(1).iter_export_lines(3000)) + '\n', encoding='utf-8')
+    # An overlapping export: the same history and some more
+    laptop = tmp_path / 'laptop.txt'
+    laptop.write_text('\n'.join(Generator(1).iter_export_lines(4000)) + '\n', encoding='utf-8')
+    digest = tmp_path / 'digest.txt'
+    digest.write_text('\n'.join(Generator(2).iter_digest_lines(500)) + '\n', encoding='utf-8')
+    data = tmp_path / 'data.csv'
+    data.write_text(HEADER + '\n', encoding='utf-8')
+    return phone, laptop, digest, data
+
+
+def sequential_rows(data, phone, laptop, digest):
+    """Rows from running the parsers one after another"""
+    games = []
+    for path, parse in ((phone, parse_imessage.iter_games), (laptop, parse_imessage.iter_games),
+                        (digest, parse_entries.iter_entries)):
+        with open(path, encoding='utf-8') as f:
+            games.extend(parse(f))
+    with DedupIndex(str(data)) as index:
+        return [row for game in iter_new_games(games, index) for row in game_rows(game)]
+
+
+def test_sources_match_sequential(capsys, sources):
+    phone, laptop, digest, data = sources
+    ingest.main(['--export', str(phone), '--export', str(laptop), '--digest', str(digest), '--data', str(data)])
+    out, err = capsys.readouterr()
+    assert out.splitlines() == sequential_rows(data, phone, laptop, digest)
+    assert 'Ingested 3 sources' in err
+
+
+def test_stdin_source(capsys, monkeypatch, sources):
+    phone, laptop, digest, data = sources
+    monkeypatch.setattr(sys, 'stdin', io.StringIO(laptop.read_text(encoding='utf-8')))
+    ingest.main(['--export', str(phone), '--export', '-', '--digest', str(digest), '--data', str(data)])
+    out, err = capsys.readouterr()
+    assert out.splitlines() == sequential_rows(data, phone, laptop, digest)
+    assert '- (export): 0 games' not in err
+
+
+def test_stdin_only_once(sources):
+    phone, laptop, digest, data = sources
+    with pytest.raises(SystemExit):
+        ingest.main(['--export', '-', '--digest', '-', '--data', str(data)])
+
+
+def test_append(capsys, sources):
+    phone, laptop, digest, data = sources
+    expected = sequential_rows(data, phone, laptop, digest)
+    ingest.main(['--export', str(phone), '--export', str(laptop), '--digest', str(digest), '--data', str(data),
+                 '--append'])
+    assert f"Appended {len(expected) // 5} new games" in capsys.readouterr().out
+    assert sorted(data.read_text(encoding='utf-8').splitlines()[1:]) == sorted(expected)
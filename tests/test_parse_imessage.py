@@ -0,0 +1,69 @@
+import pytest
+
+import parse_entries
+import parse_imessage
+from chunk_cache import ChunkCache
+from datafile import HEADER
+from synthetic import Generator
+
+
+@pytest.fixture
+def export(tmp_path):
+    return write_export(tmp_path / 'export.txt', 20000)
+
+
+def write_export(path, lines):
+    path.write_text('\n'.join(Generator(1).iter_export_lines(lines)) + '\n', encoding='utf-8')
+    return path
+
+
+def parse(tmp_path, capsys, source, *extra, module=parse_imessage):
+    """Run parse_imessage.py (or another parser) on source and return the printed rows"""
+    data = tmp_path / 'data.csv'
+    if not data.exists():
+        data.write_text(HEADER + '\n', encoding='utf-8')
+    module.main([str(source), '--data', str(data), *extra])
+    rows = capsys.readouterr().out.splitlines()
+    assert rows
+    return rows
+
+
+@pytest.mark.parametrize('jobs', [2, 3])
+def test_jobs_match_sequential(tmp_path, capsys, export, jobs):
+    assert parse(tmp_path, capsys, export, '--jobs', str(jobs)) == parse(tmp_path, capsys, export)
+
+
+@pytest.mark.parametrize('chunk_bytes', [1000, 4096, 50000])
+def test_small_chunks_match_sequential(export, chunk_bytes):
+    # Many more chunks than are allowed in flight, with games straddling their edges
+    with open(export, encoding='utf-8') as f:
+        expected = list(parse_imessage.iter_games(f))
+    assert list(parse_imessage.iter_games_parallel(str(export), 2, chunk_bytes=chunk_bytes)) == expected
+
+
+def test_cache_matches_sequential(tmp_path, capsys, export):
+    expected = parse(tmp_path, capsys, export)
+    assert parse(tmp_path, capsys, export, '--cache') == expected
+    assert parse(tmp_path, capsys, export, '--cache') == expected
+
+
+def test_cache_reuses_a_reexported_history(tmp_path, capsys, export):
+    parse(tmp_path, capsys, export, '--cache')
+    # The same chat exported again later: the same history plus new messages
+    longer = write_export(tmp_path / 'longer.txt', 30000)
+    salt = f"imessage\0{parse_imessage.roster_fingerprint(parse_imessage.get_roster())}"
+    with open(longer, 'rb') as f, ChunkCache.for_data(str(tmp_path / 'data.csv'), salt=salt) as cache:
+        games = list(parse_imessage.iter_games(f.read().decode('utf-8').splitlines(keepends=True)))
+        f.seek(0)
+        assert list(parse_imessage.iter_games_cached(f, cache)) == games
+    # The earlier export's chunks are reused; only the new tail is parsed
+    assert cache.hits > cache.misses > 0
+    assert parse(tmp_path, capsys, longer, '--cache') == parse(tmp_path, capsys, longer)
+
+
+def test_digest_cache_matches_sequential(tmp_path, capsys):
+    digest = tmp_path / 'digest.txt'
+    digest.write_text('\n'.join(Generator(2).iter_digest_lines(5000)) + '\n', encoding='utf-8')
+    expected = parse(tmp_path, capsys, digest, module=parse_entries)
+    assert parse(tmp_path, capsys, digest, '--cache', module=parse_entries) == expected
+    assert parse(tmp_path, capsys, digest, '--cache', module=parse_entries) == expected
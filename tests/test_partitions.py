@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+import partitions
+from datafile import HEADER, iter_csv_games, merge_games, open_at
+from dedup_index import DedupIndex
+from partitions import PartitionStore, sort_partition
+from synthetic import Generator
+from test_datafile import csv_lines, game, write_csv
+
+
+@pytest.fixture
+def data(tmp_path):
+    """A sorted data.csv spanning October to December, with a game whose date isn't YYYY-MM-DD"""
+    path = tmp_path / 'data.csv'
+    lines = list(Generator(3).iter_csv_lines(3000))
+    lines += [row.rstrip('\n') for row in csv_lines(game('Ryan', 'someday', 350))]
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    sort_partition(str(path))
+    return path
+
+
+def read_games(path):
+    with open_at(str(path)) as f:
+        return list(iter_csv_games(f))
+
+
+def test_split_and_export_round_trip(tmp_path, data):
+    store = PartitionStore.split(str(data), str(tmp_path / 'partitions'))
+    assert list(store.manifest['partitions']) == ['2025-10', '2025-11', '2025-12', 'other']
+    games = read_games(data)
+    assert sum(info['games'] for info in store.manifest['partitions'].values()) == len(games)
+    assert store.manifest['partitions']['2025-11']['minDate'] == '2025-11-01'
+
+    out = tmp_path / 'out.csv'
+    assert PartitionStore(str(tmp_path / 'partitions')).export(str(out)) == len(games) * 5
+    assert out.read_bytes() == data.read_bytes()
+
+
+def test_export_a_date_range(tmp_path, data):
+    store = PartitionStore.split(str(data), str(tmp_path / 'partitions'))
+    assert store.months('2025-11-10', '2025-11-20') == ['2025-11']
+    out = tmp_path / 'november.csv'
+    store.export(str(out), '2025-11-10', '2025-11-20')
+    assert read_games(out) == [g for g in read_games(data) if '2025-11-10' <= g[1] <= '2025-11-20']
+
+
+def test_split_replaces_old_partitions(tmp_path, data):
+    directory = tmp_path / 'partitions'
+    PartitionStore.split(str(data), str(directory))
+    small = tmp_path / 'small.csv'
+    write_csv(small, game('Ashley', '2025-10-01', 350))
+    store = PartitionStore.split(str(small), str(directory))
+    assert sorted(p.name for p in directory.glob('*.csv')) == ['2025-10.csv']
+    with open(directory / 'manifest.json', encoding='utf-8') as f:
+        assert json.load(f) == store.manifest
+
+
+def test_append_matches_data_file(tmp_path, data):
+    store = PartitionStore.split(str(data), str(tmp_path / 'partitions'))
+    existing = read_games(data)
+    new = [game('Ashley', '2025-11-15', 351), game('Abby', '2026-01-02', 300), game('Ryan', '2025-10-01', 400)]
+    # Already stored, or repeated within the run
+    games = [existing[0], new[0], existing[-1], new[1], new[0], new[2]]
+
+    assert store.append(games) == new
+    assert PartitionStore(str(tmp_path / 'partitions')).append(games) == []
+    assert store.manifest['partitions']['2026-01']['games'] == 1
+
+    # The same games merged into the single file
+    with DedupIndex(str(data)) as index:
+        assert index.append(games) == new
+    out = tmp_path / 'out.csv'
+    store.export(str(out))
+    assert out.read_bytes() == data.read_bytes()
+
+
+def test_cli(tmp_path, capsys, data):
+    directory = str(tmp_path / 'partitions')
+    partitions.main(['split', str(data), directory])
+    partitions.main(['export', directory, str(tmp_path / 'out.csv'), '--end', '2025-10-31'])
+    partitions.main(['info', directory])
+    out = capsys.readouterr().out.splitlines()
+    assert out[0] == f"Split {data} into 4 partitions in {directory}"
+    assert out[1].endswith(f"from 1 partitions to {tmp_path / 'out.csv'}")
+    assert out[2].startswith('2025-10: ')
+    assert (tmp_path / 'out.csv').read_text(encoding='utf-8').startswith(HEADER + '\n')
+
+
+def test_merge_games_into_a_partition(tmp_path):
+    # A partition is an ordinary sorted data file
+    path = tmp_path / '2025-10.csv'
+    merge_games(str(path), [game('Ryan', '2025-10-02', 350), game('Ashley', '2025-10-03', 350)])
+    assert partitions.partition_stats(str(path)) == {'rows': 10, 'games': 2, 'minDate': '2025-10-02',
+                                                     'maxDate': '2025-10-03'}
@@ -0,0 +1,63 @@
+import json
+import os
+import shutil
+import socket
+import subprocess
+import time
+import urllib.request
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+
+from query_engine import QueryEngine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE = os.path.join(ROOT, 'tests', 'fixtures', 'server_parity.csv')
+# server.js's responses for FIXTURE, by request path
+with open(os.path.join(ROOT, 'tests', 'fixtures', 'server_parity.json'), encoding='utf-8') as f:
+    EXPECTED = json.load(f)
+
+
+def get(engine, path):
+    url = urlsplit(path)
+    status, payload = engine.get(url.path, dict(parse_qsl(url.query)))
+    return json.dumps(payload, ensure_ascii=False)
+
+
+@pytest.mark.parametrize('path', list(EXPECTED))
+def test_matches_server_js(path):
+    # Compared as text, so key order counts too
+    assert get(QueryEngine(FIXTURE), path) == json.dumps(EXPECTED[path], ensure_ascii=False)
+
+
+def test_comma_emoji_rows_are_dropped():
+    engine = QueryEngine(FIXTURE)
+    day = json.loads(get(engine, '/api/player/ryan'))['gamesByDate']['2025-10-27']
+    # The 15 has a comma for its emoji
+    assert day['lowestScore'] == 65
+    assert ',' not in json.loads(get(engine, '/api/player/david%20ellis'))['emojiCounts']
+
+
+@pytest.mark.skipif(not shutil.which('node') or not os.path.isdir(os.path.join(ROOT, 'node_modules', 'csv-parser')),
+                    reason='needs node and npm install')
+def test_fixture_is_current(tmp_path):
+    """Check the recorded responses against server.js itself"""
+    shutil.copy(FIXTURE, tmp_path / 'data.csv')
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    server = subprocess.Popen(['node', os.path.join(ROOT, 'server.js')], cwd=tmp_path,
+                              env=dict(os.environ, PORT=str(port)), stdout=subprocess.DEVNULL)
+    try:
+        for _ in range(100):
+            try:
+                socket.create_connection(('127.0.0.1', port)).close()
+                break
+            except ConnectionError:
+                time.sleep(0.1)
+        for path in EXPECTED:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}") as response:
+                assert json.load(response) == EXPECTED[path]
+    finally:
+        server.terminate()
+        server.wait()
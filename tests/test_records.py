@@ -0,0 +1,58 @@
+import pickle
+
+import validate
+from datafile import game_key, game_rows
+from records import GameBatch, iter_batches
+from test_datafile import game
+
+# Games the columns can't reproduce, kept as their tuples
+ODD_GAMES = [
+    ('Megan', '2025-10-03', [('05', '🎯')] * 5, '350'),
+    ('Megan', '2025-10-03', [('90', '🎯')] * 5, '0350'),
+    ('Megan', '2025-10-03', [('99999', '🎯')] * 5, '350'),
+    ('Megan', '2025-10-03', [('90', '🎯')] * 5, '12345678901'),
+    ('Megan', '2025-10-03', [('90', '🎯')] * 6, '350'),
+    ('Megan', '2025-10-03', [], '0'),
+    ('Megan', '2025-10-03', [(90, '🎯')] * 5, 350),
+]
+GAMES = [game('Ashley', '2025-10-01', 350), *ODD_GAMES[:3],
+         game('David Ellis', '2025-10-02', 853, (99, 931, 87, 81, 82)), *ODD_GAMES[3:],
+         ('Ryan', 'someday', [('90', ',')] * 3, '300')]
+
+
+def test_odd_games_decode_to_their_tuples():
+    batch = GameBatch.from_games(GAMES)
+    assert sorted(batch.odd) == [1, 2, 3, 5, 6, 7, 8]
+    assert list(batch) == GAMES
+    assert [batch.game(i) for i in range(len(batch))] == GAMES
+    assert batch.keys() == [game_key(g) for g in GAMES]
+    assert list(batch.iter_rows()) == [row for g in GAMES for row in game_rows(g)]
+
+
+def test_odd_games_have_no_locations():
+    batch = GameBatch.from_games(GAMES)
+    assert list(batch.columns['nloc']) == [5, 0, 0, 0, 5, 0, 0, 0, 0, 3]
+    assert list(batch.ordinals())[:5] == [739525, 0, 0, 0, 739526]
+    # Their rows are listed as extras, numbered as in data.csv
+    extras = batch.extras
+    assert extras[0] == (5, 'Megan,2025-10-03,1,05,🎯,350')
+    assert [line for _, line in extras] == [row for g in GAMES if g in ODD_GAMES for row in game_rows(g)]
+    assert extras[-1][0] == sum(len(g[2]) for g in GAMES[:-1]) - 1
+
+
+def test_odd_games_survive_pickling_and_batching():
+    batch = pickle.loads(pickle.dumps(GameBatch.from_games(GAMES)))
+    assert list(batch) == GAMES
+    batches = list(iter_batches(GAMES, size=3))
+    assert [len(b) for b in batches] == [3, 3, 3, 1]
+    assert [g for b in batches for g in b] == GAMES
+    # The batches of a run share dictionaries
+    assert all(b.users is batches[0].users for b in batches)
+
+
+def test_validation_reports_odd_games_by_row():
+    issues, _ = validate.validate(GameBatch.from_games(GAMES))
+    counts = validate.count_issues(issues)
+    assert counts['malformed_row'] == sum(len(g[2]) for g in ODD_GAMES)
+    # Only the partial game, not the odd ones, has the wrong number of locations
+    assert counts['location_count'] == 1
@@ -0,0 +1,74 @@
+import re
+
+import pytest
+
+from roster import Roster, trie_regex
+
+
+def find(roster, line):
+    return roster.find(line.lower(), line)
+
+
+@pytest.mark.parametrize('words', [
+    ['ann', 'anna', 'annabel', 'bob'],
+    ['a.j. (jr)', 'c++ fan', 'who? me', 'a|b', r'back\slash', '[x]'],
+    ['x'],
+])
+def test_trie_matches_each_word_exactly(words):
+    pattern = re.compile(trie_regex(words))
+    for word in words:
+        assert pattern.fullmatch(word)
+    assert not pattern.fullmatch(words[0] + '!')
+
+
+def test_longest_of_prefix_names_wins():
+    roster = Roster(players=('Ann', 'Anna', 'Annabel'), exclude=())
+    assert find(roster, 'Annabel: 90 80 70') == ('Annabel', False)
+    assert find(roster, 'Anna: 90 80 70') == ('Anna', False)
+    assert find(roster, 'Ann: 90 80 70') == ('Ann', False)
+    assert find(roster, 'nobody here') is None
+
+
+def test_name_as_written_in_the_line():
+    roster = Roster(players=('David Ellis',), exclude=())
+    assert find(roster, 'DAVID ELLIS 93 88') == ('DAVID ELLIS', False)
+
+
+def test_aliases():
+    roster = Roster(players=('Stephen Alexander',), exclude=(), aliases={'Steve A': 'Stephen Alexander'})
+    assert find(roster, 'steve a: 93 88 71') == ('Stephen Alexander', False)
+    assert roster.resolve(' Steve A ') == 'Stephen Alexander'
+    assert roster.resolve('Someone Else') == 'Someone Else'
+
+
+def test_excluded_names_take_precedence():
+    roster = Roster(players=('David Ellis', 'Abi'), exclude=('Abigail Jenquist',),
+                    aliases={'Abby J': 'Abigail Jenquist'})
+    # Anywhere in the line, even after a player's name
+    assert find(roster, 'David Ellis replying to Abigail Jenquist') == ('abigail jenquist', True)
+    # Over a player whose name is a prefix of it
+    assert find(roster, 'abigail jenquist 90') == ('abigail jenquist', True)
+    assert find(roster, 'Abby J 90') == ('abby j', True)
+    assert find(roster, 'Abi 90') == ('Abi', False)
+
+    # Digests keep excluded players unless told otherwise
+    assert roster.resolve('Abby J') == 'Abigail Jenquist'
+    digests = Roster(players=('David Ellis',), exclude=('Abigail Jenquist',), aliases={'Abby J': 'Abigail Jenquist'},
+                     exclude_digests=True)
+    assert digests.resolve('Abby J') is None
+    assert digests.resolve('abigail jenquist') is None
+    assert digests.resolve('David Ellis') == 'David Ellis'
+
+
+def test_metacharacters_are_literal():
+    roster = Roster(players=('A.J. (Jr)', 'C++ Fan', 'Who? Me'), exclude=())
+    assert find(roster, 'A.J. (Jr): 90') == ('A.J. (Jr)', False)
+    assert find(roster, 'c++ fan 80') == ('c++ fan', False)
+    assert find(roster, 'Who? Me 70') == ('Who? Me', False)
+    # '.' and '?' only match themselves
+    assert find(roster, 'AxJx (Jr) 90') is None
+    assert find(roster, 'Wh Me 70') is None
+
+
+def test_empty_roster_finds_nothing():
+    assert find(Roster(players=(), exclude=()), 'David Ellis 90') is None
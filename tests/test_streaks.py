@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from datafile import HEADER, iter_csv_games, open_at, state_path
+from dedup_index import DedupIndex
+from streaks import StreakEngine
+
+
+def game(user, date, total):
+    return (user, date, [(str(total // 5), '🎯')] * 5, str(total))
+
+
+def full_read(data):
+    engine = StreakEngine()
+    engine.rebuild(str(data))
+    return engine.summary()
+
+
+def test_appends_match_a_full_read(tmp_path):
+    data = tmp_path / 'data.csv'
+    data.write_text(HEADER + '\n', encoding='utf-8')
+    with DedupIndex(str(data)) as index:
+        index.append([game('Ashley', f'2025-10-{day:02}', 500 + day) for day in range(1, 20)])
+        index.append([game('Ashley', '2025-10-21', 600), game('Ryan', '2025-10-21', 700)])
+        index.append([game('Ashley', '2025-10-22', 650), game('Ashley', '2025-10-22', 900)])
+    summary = StreakEngine.load(str(data)).summary()
+    assert summary == full_read(data)
+    assert summary['players']['ashley']['currentStreak'] == 2
+    assert summary['players']['ashley']['longestStreak'] == {'streak': 19, 'startDate': '2025-10-01',
+                                                             'endDate': '2025-10-19'}
+    assert summary['rollingAverages']['sevenDay']['avgScore'] == 555
+
+
+def test_state_is_bounded(tmp_path):
+    data = tmp_path / 'data.csv'
+    data.write_text(HEADER + '\n', encoding='utf-8')
+    with DedupIndex(str(data)) as index:
+        index.append([game('Ashley', f'2025-{month:02}-{day:02}', 500) for month in range(1, 13)
+                      for day in range(1, 29)])
+    with open(state_path(str(data), 'streaks.json'), encoding='utf-8') as f:
+        state = json.load(f)
+    assert len(state['window']) == 30
+    assert len(state['players']['ashley']['recent']) == 30
+
+
+def test_late_game_rebuilds(tmp_path):
+    data = tmp_path / 'data.csv'
+    data.write_text(HEADER + '\n', encoding='utf-8')
+    with DedupIndex(str(data)) as index:
+        index.append([game('Ashley', '2025-10-01', 500), game('Ashley', '2025-10-03', 500)])
+        # Fills the gap, joining both days into one run
+        index.append([game('Ashley', '2025-10-02', 800)])
+    summary = StreakEngine.load(str(data)).summary()
+    assert summary == full_read(data)
+    assert summary['players']['ashley']['currentStreak'] == 3
+    with open_at(str(data)) as f:
+        assert len(list(iter_csv_games(f))) == 3
+
+
+def test_days_out_of_order_in_one_append(tmp_path, monkeypatch):
+    data = tmp_path / 'data.csv'
+    data.write_text(HEADER + '\n', encoding='utf-8')
+    with DedupIndex(str(data)) as index:
+        index.append([game('Ashley', '2025-10-01', 500)])
+        monkeypatch.setattr(StreakEngine, 'rebuild', lambda *args: pytest.fail('rebuilt'))
+        # As when sources are concatenated: one player's days in no particular order
+        index.append([game('Ashley', '2025-10-03', 500), game('Ashley', '2025-10-02', 800)])
+    monkeypatch.undo()
+    summary = StreakEngine.load(str(data)).summary()
+    assert summary == full_read(data)
+    assert summary['players']['ashley']['currentStreak'] == 3
@@ -0,0 +1,73 @@
+import validate
+from datafile import HEADER, game_rows
+from dedup_index import DedupIndex
+from game_store import GameStore
+from records import GameBatch
+
+
+def game(user, date, scores, total, emoji='🎯'):
+    return (user, date, [(str(score), emoji if score <= 100 else '') for score in scores], str(total))
+
+
+GAMES = [
+    # Clean: 90 + 80 + 2*70 + 3*60 + 3*50
+    game('Ashley', '2025-10-01', (90, 80, 70, 60, 50), 640),
+    # 931 is 93 plus a glued digit, and the total agrees
+    game('David Ellis', '2025-10-01', (931, 80, 70, 60, 50), 643),
+    # Splittable, but the total doesn't confirm it
+    game('Ryan', '2025-10-01', (871, 80, 70, 60, 50), 700),
+    # Dropping a digit still leaves a score over 100
+    game('Megan', '2025-10-01', (1234, 80, 70, 60, 50), 640),
+    game('Abby', '2025-10-02', (90, 80, 70, 60), 490),
+    game('Scott', '2025-10-02', (100, 100, 100, 100, 100), 1100),
+    ('Ellie', '2025-10-02', [('90', '🎯'), ('80', ''), ('70', '🎯'), ('60', '🎯'), ('50', '🎯')], '640'),
+]
+
+
+def write_data(path, games):
+    path.write_text(HEADER + '\n' + ''.join(row + '\n' for g in games for row in game_rows(g)), encoding='utf-8')
+
+
+def test_issues_and_proposals():
+    issues, proposals = validate.validate(GameBatch.from_games(GAMES))
+    assert validate.count_issues(issues) == {'location_count': 1, 'missing_emoji': 2, 'score_over_100': 3,
+                                             'total_mismatch': 2, 'total_out_of_range': 1}
+    assert {(i['user'], i['issue']) for i in issues if i['issue'] != 'score_over_100'} == {
+        ('Megan', 'missing_emoji'), ('Ellie', 'missing_emoji'), ('Abby', 'location_count'),
+        ('Ryan', 'total_mismatch'), ('Megan', 'total_mismatch'), ('Scott', 'total_out_of_range')}
+    assert [(p['user'], p['split_score'], p['split_emoji'], p['total_confirms']) for p in proposals] == [
+        ('David Ellis', 93, '1', True), ('Ryan', 87, '1', False)]
+
+
+def test_store_and_batch_agree(tmp_path):
+    data = tmp_path / 'data.csv'
+    write_data(data, GAMES)
+    store = GameStore.from_csv(str(data))
+    try:
+        assert validate.validate(store) == validate.validate(GameBatch.from_games(GAMES))
+    finally:
+        store.close()
+
+
+def test_apply_only_confirmed_splits(tmp_path, capsys):
+    data = tmp_path / 'data.csv'
+    write_data(data, GAMES)
+    validate.main(['--data', str(data), '--apply'])
+    out = capsys.readouterr().out
+    assert 'ms encoding the store' in out
+    assert 'Applied 1 splits' in out
+    text = data.read_text(encoding='utf-8')
+    assert 'David Ellis,2025-10-01,1,93,1,643\n' in text
+    assert 'Ryan,2025-10-01,1,871,,700\n' in text
+    assert 'Megan,2025-10-01,1,1234,,640\n' in text
+
+
+def test_appends_are_validated(tmp_path, capsys):
+    data = tmp_path / 'data.csv'
+    data.write_text(HEADER + '\n', encoding='utf-8')
+    with DedupIndex(str(data)) as index:
+        index.append(GAMES[:1])
+        assert capsys.readouterr().err == ''
+        index.append(GAMES[1:3])
+    assert capsys.readouterr().err == ('Validation: 3 issues in 2 new games (score_over_100: 2, total_mismatch: 1), '
+                                       '2 proposed splits; run validate.py for details\n')
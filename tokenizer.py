@@ -0,0 +1,148 @@
+"""Single-pass line tokenizer shared by both input formats.
+
+Chat export lines are lowercased once. Player names are found with one scan
+of the roster's trie regex, and other line kinds with plain substring tests;
+a regex only runs on a line that can actually match it. Score lines go
+through one precompiled pattern whose groups are the five (number, emoji)
+pairs, so no per-token matching is needed. Digest lines ("Oct 29: David
+Ellis: 99! 96" 98" 24❄ 815, Final: 706") are matched once and their score
+pairs read from the match span in place.
+"""
+import re
+
+from roster import Roster
+
+# Month mapping
+MONTHS = {
+    'january': '01', 'jan': '01',
+    'february': '02', 'feb': '02',
+    'march': '03', 'mar': '03',
+    'april': '04', 'apr': '04',
+    'may': '05',
+    'june': '06', 'jun': '06',
+    'july': '07', 'jul': '07',
+    'august': '08', 'aug': '08',
+    'september': '09', 'sep': '09', 'sept': '09',
+    'october': '10', 'oct': '10',
+    'november': '11', 'nov': '11',
+    'december': '12', 'dec': '12'
+}
+YEAR = '2025'
+
+# MapTap date line: "www.MapTap.gg October 23" or "MapTap October 30" (matched lowercased)
+MAPTAP_RE = re.compile(r'maptap.*?(october|november|december|oct|nov|dec)\s+(\d+)')
+# Score line: "97! 94" 81# 65$ 35%" - number followed by emoji/symbol, repeated 5 times
+SCORE_RE = re.compile(r'\s*' + r'\s+'.join([r'(\d+)([^\d\s]{0,3})'] * 5))
+# "Final score: 853" (matched lowercased)
+FINAL_RE = re.compile(r'final\s+score:\s*(\d+)')
+
+# Digest line: "Oct 29: David Ellis: 99! 96" 98" 24❄ 815, Final: 706"
+DIGEST_RE = re.compile(r'(Oct|Nov|Dec|October|November|December)\s+(\d+):\s*([^:]+):\s*([^,]+),\s*Final:\s*(\d+)')
+DIGEST_SCORE_RE = re.compile(r'(\d+)([^\d\s]{1,3})')
+
+# Line kinds
+SKIP = 'skip'
+USER = 'user'
+DATE = 'date'
+SCORE = 'score'
+
+# Event for a line that cannot change the parser state
+IGNORED = (None, False, None, None)
+
+# Name, date, "Final score" and chatter lines repeat constantly in an export,
+# so their events are memoized; the memo is cleared when it fills up
+CACHE_SIZE = 8192
+_cache = {}
+# Players recognized in name lines and digest lines
+_roster = Roster()
+
+
+def set_roster(roster):
+    """Use roster for all further classification (also a process pool initializer)"""
+    global _roster
+    _roster = roster
+    _cache.clear()
+
+
+def get_roster():
+    return _roster
+
+
+def classify_line(raw):
+    """Classify one chat export line independently of parser state.
+
+    Returns (final, maptap, kind, value): the "Final score" on the line, if
+    any, whether it mentions MapTap, and what kind of line it is (SKIP, USER,
+    DATE, SCORE or None) with its parsed value. Lines that can't affect the
+    parser return IGNORED.
+    """
+    event = _cache.get(raw)
+    if event is None:
+        event = _classify(raw)
+        # Score lines are practically unique, so they aren't worth keeping
+        if event[2] != SCORE:
+            if len(_cache) >= CACHE_SIZE:
+                _cache.clear()
+            _cache[raw] = event
+    return event
+
+
+def _classify(raw):
+    lowered = raw.lower()
+    maptap = 'maptap' in lowered
+    final = None
+    if 'score' in lowered:
+        final_match = FINAL_RE.search(lowered)
+        if final_match:
+            final = final_match.group(1)
+
+    # Excluded players' entries are skipped; other names start an entry
+    player = _roster.find(lowered, raw)
+    if player is not None:
+        name, excluded = player
+        if excluded:
+            return (final, maptap, SKIP, None)
+        return (final, maptap, USER, name)
+
+    if maptap:
+        maptap_match = MAPTAP_RE.search(lowered)
+        if maptap_match:
+            month = MONTHS.get(maptap_match.group(1), '12')
+            return (final, maptap, DATE, f"{YEAR}-{month}-{maptap_match.group(2).zfill(2)}")
+
+    score_match = SCORE_RE.match(raw)
+    if score_match:
+        g = score_match.groups()
+        scores = ((g[0], g[1]), (g[2], g[3]), (g[4], g[5]), (g[6], g[7]), (g[8], g[9]))
+        return (final, maptap, SCORE, scores)
+
+    if final is None and not maptap:
+        return IGNORED
+    return (final, maptap, None, None)
+
+
+def parse_digest_line(line, stats=None):
+    """Parse one digest line into a (user, date, scores, final) game, or None.
+
+    The name goes through the roster, so aliases resolve; excluded players
+    are only dropped if the roster sets exclude_digests. With stats, the
+    reason a line is rejected is counted.
+    """
+    match = DIGEST_RE.match(line)
+    if not match:
+        if stats is not None:
+            stats.count('rejected.not_a_digest_line')
+        return None
+    scores = DIGEST_SCORE_RE.findall(line, match.start(4), match.end(4))
+    if len(scores) != 5:
+        if stats is not None:
+            stats.count('rejected.not_five_scores')
+        return None
+    user = _roster.resolve(match.group(3))
+    if user is None:
+        if stats is not None:
+            stats.count('rejected.excluded_player')
+        return None
+    month = MONTHS.get(match.group(1).lower(), '12')
+    date = f"{YEAR}-{month}-{match.group(2).zfill(2)}"
+    return (user, date, scores, match.group(5))
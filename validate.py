@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""Validate the whole game history at once with NumPy.
+
+Works on the columnar game store, so every check is a handful of array
+operations over all games rather than a Python loop over rows. Flags
+location scores over 100, missing emojis, games without exactly five
+locations, totals outside 0-1000 and totals that don't match the weighted
+location scores, plus rows the store had to keep verbatim.
+
+A score over 100 with no emoji is almost always an emoji that exported as a
+digit and got glued onto the score ("931" is 93 followed by "1"). Where
+dropping the last digit leaves a valid score, the split is proposed, and
+--apply rewrites the rows whose split the game's total confirms in data.csv.
+
+Encoding data.csv into a store is a Python loop over its rows and takes
+several seconds for a million games; validating a saved store (--store)
+doesn't pay for that. Every --append also validates the games it merges
+(see append_hook.py).
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from datafile import DATA_CSV, WEIGHTS, atomic_write, locked, split_row
+from game_store import LOCATIONS, GameStore
+
+MAX_TOTAL = 1000
+
+
+def validate(store):
+    """Return (issues, proposals) for every game in the store (or records.GameBatch).
+
+    Issues are dicts with an 'issue' name, the game's user, date and total and,
+    for location issues, the location number, score and emoji. Proposals are
+    the unambiguous splits of merged scores.
+    """
+    cols = store.to_numpy()
+    scores = cols['scores'].astype(np.int32)
+    emojis = cols['emojis']
+    nloc = cols['nloc']
+    totals = cols['total']
+
+    present = np.arange(LOCATIONS) < nloc[:, None]
+    over = present & (scores > 100)
+    # Dropping the glued digit must leave a valid score for the split to be safe
+    splittable = over & (scores // 10 <= 100)
+    missing_emoji = present & (emojis == 0) & ~splittable
+
+    repaired = np.where(splittable, scores // 10, scores)
+    weighted = np.where(present, repaired, 0) @ np.array(WEIGHTS, dtype=np.int32)
+    complete = nloc == LOCATIONS
+    out_of_range = (totals < 0) | (totals > MAX_TOTAL)
+    mismatch = complete & ~out_of_range & (weighted != totals)
+
+    def game(i):
+        return {'user': store.users[cols['user'][i]], 'date': store.dates[cols['date'][i]],
+                'total': int(totals[i])}
+
+    def location(i, k):
+        return dict(game(i), location=int(k) + 1, score=int(scores[i, k]),
+                    emoji=store.emojis[emojis[i, k]])
+
+    issues = []
+    for name, mask in (('score_over_100', over), ('missing_emoji', missing_emoji)):
+        issues.extend(dict(location(i, k), issue=name) for i, k in zip(*np.nonzero(mask)))
+    # A game batch marks games it keeps as tuples with no locations; they are
+    # reported with the extras instead
+    kept = nloc == 0
+    for name, mask in (('location_count', ~complete & ~kept), ('total_out_of_range', out_of_range),
+                       ('total_mismatch', mismatch)):
+        for i in np.flatnonzero(mask):
+            issue = dict(game(i), issue=name)
+            if name == 'location_count':
+                issue['locations'] = int(nloc[i])
+            elif name == 'total_mismatch':
+                issue['expected'] = int(weighted[i])
+            issues.append(issue)
+    issues.extend({'issue': 'malformed_row', 'row': row, 'line': line} for row, line in store.extras)
+
+    proposals = [
+        dict(location(i, k), split_score=int(scores[i, k] // 10), split_emoji=str(scores[i, k] % 10),
+             total_confirms=bool(complete[i] and weighted[i] == totals[i]))
+        for i, k in zip(*np.nonzero(splittable))
+    ]
+    return issues, proposals
+
+
+def count_issues(issues):
+    """Issue name -> how many there are"""
+    counts = {}
+    for issue in issues:
+        counts[issue['issue']] = counts.get(issue['issue'], 0) + 1
+    return dict(sorted(counts.items()))
+
+
+def apply_splits(data_path, proposals):
+    """Rewrite the rows of the proposed splits in data_path; returns how many changed.
+
+    Only splits confirmed by the game's total are applied.
+    """
+    fixes = {(p['user'], p['date'], str(p['location']), str(p['score']), str(p['total'])): p
+             for p in proposals if p['total_confirms']}
+    changed = 0
+    with locked(data_path), open(data_path, 'r', encoding='utf-8', newline='') as src, \
+            atomic_write(data_path) as out:
+        for line in src:
+            fields = split_row(line)
+            if fields is not None and fields[4] == '':
+                user, date, loc_num, score, _, total = fields
+                fix = fixes.get((user, date, loc_num, score, total))
+                if fix is not None:
+                    line = f"{user},{date},{loc_num},{fix['split_score']},{fix['split_emoji']},{total}\n"
+                    changed += 1
+            out.write(line)
+    return changed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Validate all games and propose repairs for merged scores')
+    parser.add_argument('--data', default=DATA_CSV, help='data file to validate')
+    parser.add_argument('--store', help='saved game store to validate instead of encoding the data file')
+    parser.add_argument('--json', help='write all issues and proposals to this file')
+    parser.add_argument('--apply', action='store_true',
+                        help='apply the proposed splits that the total confirms to the data file')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    if args.store:
+        store = GameStore.load(args.store)
+    else:
+        store = GameStore.from_csv(args.data)
+    loaded = time.perf_counter()
+    games = len(store)
+    try:
+        issues, proposals = validate(store)
+    finally:
+        store.close()
+    end = time.perf_counter()
+
+    print(f"Validated {games} games in {(end - start) * 1000:.1f} ms "
+          f"({(loaded - start) * 1000:.1f} ms {'loading' if args.store else 'encoding'} the store, "
+          f"{(end - loaded) * 1000:.1f} ms checking)")
+    for name, count in count_issues(issues).items():
+        print(f"  {name}: {count}")
+    print(f"  proposed splits: {len(proposals)} "
+          f"({sum(p['total_confirms'] for p in proposals)} confirmed by the total)")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'issues': issues, 'proposals': proposals}, f, ensure_ascii=False, indent=2)
+
+    if args.apply:
+        changed = apply_splits(args.data, proposals)
+        print(f"Applied {changed} splits to {args.data}")
+
+
+if __name__ == '__main__':
+    main()